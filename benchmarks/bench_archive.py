@@ -0,0 +1,64 @@
+"""Compare disk use and full-history reads of a live session and its archive.
+
+Run from the repository root: python -m benchmarks.bench_archive [points]
+Works on a temporary database; location_services.db is not touched.
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import utils.location_utils as location_utils
+
+
+def _db_size(conn) -> int:
+    conn.execute('VACUUM')
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    return os.path.getsize(location_utils.DB_PATH)
+
+
+def _time_read(token: str, **kwargs) -> float:
+    start = time.perf_counter()
+    location_utils.get_location_history(token, **kwargs)
+    return time.perf_counter() - start
+
+
+def main(count: int = 200000):
+    with tempfile.TemporaryDirectory() as directory:
+        location_utils.DB_PATH = os.path.join(directory, 'bench.db')
+        conn = location_utils.get_connection()
+        empty = _db_size(conn)
+
+        # A one-second GPS trace wandering around Berlin
+        rng = np.random.default_rng(42)
+        lats = 52.52 + np.cumsum(rng.normal(0, 2e-5, count))
+        lons = 13.405 + np.cumsum(rng.normal(0, 2e-5, count))
+        accuracies = np.round(rng.uniform(3, 30, count), 1)
+        token = location_utils.create_tracking_session(1)
+        location_utils.add_location_points(token, [
+            (lat, lon, accuracy, 1700000000 + i)
+            for i, (lat, lon, accuracy) in enumerate(zip(lats.tolist(), lons.tolist(), accuracies.tolist()))
+        ])
+        location_utils.end_tracking_session(token)
+
+        live_size = _db_size(conn) - empty
+        live_dicts = _time_read(token)
+        live_arrays = _time_read(token, as_arrays=True)
+
+        location_utils.archive_session(token)
+        archive_size = _db_size(conn) - empty
+        archive_dicts = _time_read(token)
+        archive_arrays = _time_read(token, as_arrays=True)
+
+        print(f"{'':<10} {'disk':>12} {'dict read':>12} {'array read':>12}")
+        print(f"{'live':<10} {live_size / 1024:9.0f} KB {live_dicts * 1000:9.1f} ms {live_arrays * 1000:9.1f} ms")
+        print(f"{'archived':<10} {archive_size / 1024:9.0f} KB {archive_dicts * 1000:9.1f} ms {archive_arrays * 1000:9.1f} ms")
+        print(f"{'ratio':<10} {live_size / archive_size:11.1f}x {live_dicts / archive_dicts:11.1f}x"
+              f" {live_arrays / archive_arrays:11.1f}x")
+        location_utils.close_connection()
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
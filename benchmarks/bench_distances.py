@@ -0,0 +1,35 @@
+"""Compare per-element geodesic distances with the batch calculate_distances API.
+
+Run from the repository root: python -m benchmarks.bench_distances [count]
+"""
+import sys
+import time
+
+import numpy as np
+
+from utils.api_utils import calculate_distance, calculate_distances
+
+
+def main(count: int = 5000):
+    rng = np.random.default_rng(42)
+    lat, lon = 52.52, 13.405
+    # Points within ~5 km, like a dense Overpass result
+    lats = lat + rng.uniform(-0.045, 0.045, count)
+    lons = lon + rng.uniform(-0.07, 0.07, count)
+
+    start = time.perf_counter()
+    reference = np.array([calculate_distance(lat, lon, a, b) for a, b in zip(lats, lons)])
+    baseline = time.perf_counter() - start
+    print(f"{'per-element geodesic':<24} {baseline * 1000:9.2f} ms")
+
+    for mode in ('geodesic', 'haversine', 'equirectangular'):
+        start = time.perf_counter()
+        distances = calculate_distances(lat, lon, lats, lons, mode=mode)
+        elapsed = time.perf_counter() - start
+        error = np.max(np.abs(distances - reference) / reference)
+        print(f"{'batch ' + mode:<24} {elapsed * 1000:9.2f} ms"
+              f"  {baseline / elapsed:8.0f}x  max rel. error {error:.2e}")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
@@ -0,0 +1,50 @@
+"""Compare N x M get_route calls with one get_route_matrix call.
+
+Runs against the local OSRM stand-in in benchmarks/osrm_stub.py.
+Run from the repository root: python -m benchmarks.bench_routes [n] [m]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.osrm_stub import OSRMStubHandler, start_stub
+
+
+def main(n: int = 10, m: int = 10):
+    server = start_stub()
+    os.environ['OSRM_BASE_URL'] = f"http://127.0.0.1:{server.server_port}"
+    os.environ['GEO_CACHE_DB_PATH'] = os.path.join(tempfile.mkdtemp(), 'bench_cache.db')
+
+    from utils import api_utils
+
+    origins = [(52.50 + i * 0.01, 13.40) for i in range(n)]
+    destinations = [(52.52, 13.30 + j * 0.01) for j in range(m)]
+
+    start = time.perf_counter()
+    pairwise = [[api_utils.get_route(*o, *d)['distance'] for d in destinations] for o in origins]
+    elapsed = time.perf_counter() - start
+    print(f"{'pairwise get_route (cold)':<28} {elapsed * 1000:9.2f} ms  {OSRMStubHandler.requests_served} requests")
+
+    served = OSRMStubHandler.requests_served
+    start = time.perf_counter()
+    for o in origins:
+        for d in destinations:
+            api_utils.get_route(*o, *d)
+    elapsed = time.perf_counter() - start
+    print(f"{'pairwise get_route (cached)':<28} {elapsed * 1000:9.2f} ms  {OSRMStubHandler.requests_served - served} requests")
+
+    served = OSRMStubHandler.requests_served
+    start = time.perf_counter()
+    matrix = api_utils.get_route_matrix(origins, destinations)
+    elapsed = time.perf_counter() - start
+    print(f"{'get_route_matrix':<28} {elapsed * 1000:9.2f} ms  {OSRMStubHandler.requests_served - served} requests")
+
+    error = max(abs(a - b) for row_a, row_b in zip(pairwise, matrix['distances']) for a, b in zip(row_a, row_b))
+    print(f"max difference between pairwise and matrix distances: {error:.3f} m")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    args = [int(a) for a in sys.argv[1:3]]
+    main(*args)
@@ -0,0 +1,105 @@
+"""Minimal local stand-in for the OSRM route and table services.
+
+Distances are great-circle, durations assume a constant 50 km/h and route
+geometry is the straight line between the endpoints. Good enough to exercise
+caching and batching without a real routing server.
+
+Run standalone: python -m benchmarks.osrm_stub [port]
+"""
+import json
+import math
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+SPEED_MPS = 50 / 3.6
+
+
+def _haversine(a, b):
+    lon1, lat1, lon2, lat2 = map(math.radians, (*a, *b))
+    h = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * 6371008.8 * math.asin(math.sqrt(h))
+
+
+def _encode_polyline(points, precision=5):
+    factor = 10 ** precision
+    result = []
+    prev = [0, 0]
+    for lat, lon in points:
+        for i, value in enumerate((lat, lon)):
+            value = int(round(value * factor))
+            delta = value - prev[i]
+            prev[i] = value
+            delta = ~(delta << 1) if delta < 0 else delta << 1
+            while delta >= 0x20:
+                result.append(chr((0x20 | (delta & 0x1f)) + 63))
+                delta >>= 5
+            result.append(chr(delta + 63))
+    return ''.join(result)
+
+
+class OSRMStubHandler(BaseHTTPRequestHandler):
+    requests_served = 0
+    # Set to e.g. 'NoRoute' to answer every request with that error code
+    error_code = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        OSRMStubHandler.requests_served += 1
+        url = urlsplit(self.path)
+        parts = url.path.strip('/').split('/')
+        if len(parts) != 4:
+            return self._send(400, {'code': 'InvalidUrl'})
+        service, coordinates = parts[0], parts[3]
+        coords = [tuple(map(float, c.split(','))) for c in coordinates.split(';')]
+        query = parse_qs(url.query)
+
+        if OSRMStubHandler.error_code:
+            return self._send(200, {'code': OSRMStubHandler.error_code})
+
+        if service == 'route':
+            distance = sum(_haversine(a, b) for a, b in zip(coords, coords[1:]))
+            geometry = _encode_polyline([(lat, lon) for lon, lat in coords])
+            return self._send(200, {'code': 'Ok', 'routes': [{
+                'distance': distance,
+                'duration': distance / SPEED_MPS,
+                'geometry': geometry
+            }]})
+
+        if service == 'table':
+            indexes = list(range(len(coords)))
+            sources = [int(i) for i in query['sources'][0].split(';')] if 'sources' in query else indexes
+            targets = [int(i) for i in query['destinations'][0].split(';')] if 'destinations' in query else indexes
+            distances = [[_haversine(coords[s], coords[t]) for t in targets] for s in sources]
+            return self._send(200, {
+                'code': 'Ok',
+                'distances': distances,
+                'durations': [[d / SPEED_MPS for d in row] for row in distances]
+            })
+
+        return self._send(400, {'code': 'InvalidService'})
+
+    def _send(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def start_stub(port: int = 0) -> ThreadingHTTPServer:
+    """Start the stub in a background thread; the bound port is server.server_port."""
+    server = ThreadingHTTPServer(('127.0.0.1', port), OSRMStubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    print(f"OSRM stub listening on http://127.0.0.1:{port}")
+    ThreadingHTTPServer(('127.0.0.1', port), OSRMStubHandler).serve_forever()
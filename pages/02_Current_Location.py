@@ -9,10 +9,7 @@ from utils.map_utils import (
     add_location_circle,
     display_map
 )
-from utils.api_utils import (
-    get_location_details,
-    get_timezone_info
-)
+from utils.api_utils import enrich_location
 
 st.set_page_config(page_title="Current Location", page_icon="🎯", layout="wide")
 
@@ -22,6 +19,41 @@ if 'location_details' not in st.session_state:
     st.session_state.location_details = None
 if 'favorite_locations' not in st.session_state:
     st.session_state.favorite_locations = []
+if 'timezone_info' not in st.session_state:
+    st.session_state.timezone_info = None
+if 'enrich_pending' not in st.session_state:
+    st.session_state.enrich_pending = []
+
+ENRICH_STATE_KEYS = {'details': 'location_details', 'timezone': 'timezone_info'}
+
+def set_current_location(location):
+    """Store a location and look up its address and timezone concurrently."""
+    st.session_state.current_location = location
+    enriched = enrich_location(
+        location['latitude'],
+        location['longitude'],
+        parts=('details', 'timezone')
+    )
+    st.session_state.location_details = enriched.get('details')
+    st.session_state.timezone_info = enriched.get('timezone')
+    st.session_state.enrich_pending = enriched['pending']
+
+def refresh_pending_details():
+    """Pick up lookups that missed the deadline; they finish in the background."""
+    location = st.session_state.current_location
+    enriched = enrich_location(
+        location['latitude'],
+        location['longitude'],
+        parts=st.session_state.enrich_pending,
+        timeout=0.5
+    )
+    for part in st.session_state.enrich_pending:
+        if part in enriched:
+            setattr(st.session_state, ENRICH_STATE_KEYS[part], enriched[part])
+    st.session_state.enrich_pending = enriched['pending']
+
+if st.session_state.current_location and st.session_state.enrich_pending:
+    refresh_pending_details()
 
 st.title("Current Location Finder")
 st.markdown("Find your precise location with detailed address information")
@@ -97,11 +129,7 @@ with col2:
             )
 
         if location and isinstance(location, dict):
-            st.session_state.current_location = location
-            st.session_state.location_details = get_location_details(
-                location['latitude'],
-                location['longitude']
-            )
+            set_current_location(location)
             st.success("Precise browser location found!")
         else:
             st.warning("Browser location failed. Using IP-based location instead...")
@@ -112,11 +140,7 @@ with col2:
                     'longitude': g.latlng[1],
                     'accuracy': 20000  # Approximate accuracy for IP
                 }
-                st.session_state.current_location = ip_location
-                st.session_state.location_details = get_location_details(
-                    ip_location['latitude'],
-                    ip_location['longitude']
-                )
+                set_current_location(ip_location)
                 st.success("IP-based location found.")
             else:
                 st.error("Unable to get location via browser or IP. Please try manual input.")
@@ -126,14 +150,10 @@ with col2:
     manual_lon = st.number_input("Longitude", value=0.0, format="%.6f")
 
     if st.button("Set Manual Location"):
-        st.session_state.current_location = {
+        set_current_location({
             'latitude': manual_lat,
             'longitude': manual_lon
-        }
-        st.session_state.location_details = get_location_details(
-            manual_lat,
-            manual_lon
-        )
+        })
         st.success("Manual location set!")
 
     if st.session_state.current_location:
@@ -143,6 +163,11 @@ with col2:
         if 'accuracy' in st.session_state.current_location:
             st.write(f"Accuracy: ±{st.session_state.current_location['accuracy']:.0f} meters")
 
+        if st.session_state.enrich_pending:
+            st.info("⏳ Still looking up " + " and ".join(st.session_state.enrich_pending) + "...")
+            if st.button("🔄 Check again"):
+                st.rerun()
+
         if st.session_state.location_details:
             st.subheader("Address Details")
             st.write(f"Address: {st.session_state.location_details.get('address', 'N/A')}")
@@ -151,19 +176,20 @@ with col2:
             st.write(f"Country: {st.session_state.location_details.get('country', 'N/A')}")
             st.write(f"Postal Code: {st.session_state.location_details.get('postcode', 'N/A')}")
 
-            timezone_info = get_timezone_info(
-                st.session_state.current_location['latitude'],
-                st.session_state.current_location['longitude']
-            )
-            if timezone_info:
-                st.subheader("Timezone Information")
-                st.write(f"Timezone: {timezone_info['timezone']}")
-                st.write(f"UTC Offset: {timezone_info['offset']} seconds")
-                st.write(f"DST: {'Yes' if timezone_info['dst'] else 'No'}")
+        # Rendered from session state only; a pending lookup is picked up on a later rerun
+        timezone_info = st.session_state.timezone_info
+        if timezone_info:
+            st.subheader("Timezone Information")
+            st.write(f"Timezone: {timezone_info['timezone']}")
+            st.write(f"UTC Offset: {timezone_info['offset']} seconds")
+            st.write(f"DST: {'Yes' if timezone_info['dst'] else 'No'}")
+        elif 'timezone' in st.session_state.enrich_pending:
+            st.subheader("Timezone Information")
+            st.caption("Timezone: looking up...")
 
         if st.button("Save to Favorites"):
             favorite = {
-                'name': st.session_state.location_details.get('address', 'Unnamed Location'),
+                'name': (st.session_state.location_details or {}).get('address', 'Unnamed Location'),
                 'latitude': st.session_state.current_location['latitude'],
                 'longitude': st.session_state.current_location['longitude'],
                 'timestamp': datetime.now().isoformat()
@@ -180,14 +206,10 @@ with col2:
                 st.write(f"Saved: {fav['timestamp']}")
 
                 if st.button(f"Load Location {i+1}"):
-                    st.session_state.current_location = {
+                    set_current_location({
                         'latitude': fav['latitude'],
                         'longitude': fav['longitude']
-                    }
-                    st.session_state.location_details = get_location_details(
-                        fav['latitude'],
-                        fav['longitude']
-                    )
+                    })
                     st.experimental_rerun()
 
 st.markdown("---")
@@ -1,14 +1,18 @@
 import streamlit as st
-import requests
 import folium
 from streamlit_folium import st_folium
 import geocoder
+from utils.api_utils import search_nearby_places
 
 # Streamlit Page Configuration
 st.set_page_config(page_title="Nearby Places", page_icon="🔍", layout="wide")
 st.title("Nearby Places")
 st.markdown("Discover points of interest around your location")
 
+PLACES_LIMIT = 15
+# Categories that are an OSM key rather than a value of one
+CATEGORY_TAGS = {"shop": {"shop": None}}
+
 # Session state initialization
 if 'current_location' not in st.session_state:
     st.session_state.current_location = None
@@ -34,26 +38,18 @@ with st.sidebar:
         if st.session_state.current_location:
             lat = st.session_state.current_location["lat"]
             lon = st.session_state.current_location["lon"]
-            query = st.session_state.selected_category or ""
-            url = f"https://photon.komoot.io/api/?q={query}&lat={lat}&lon={lon}&limit=15"
-            try:
-                with st.spinner("Searching..."):
-                    res = requests.get(url)
-                    features = res.json().get("features", [])
-                    places = []
-                    for f in features:
-                        coords = f["geometry"]["coordinates"]
-                        props = f["properties"]
-                        places.append({
-                            "name": props.get("name", "Unnamed"),
-                            "type": props.get("osm_value", "unknown"),
-                            "lat": coords[1],
-                            "lon": coords[0]
-                        })
-                    st.session_state.nearby_places = places
-                    st.success(f"Found {len(places)} places.")
-            except Exception as e:
-                st.error(f"Error fetching places: {e}")
+            category = st.session_state.selected_category
+            with st.spinner("Searching..."):
+                # Served from the Overpass tile cache where possible
+                places = search_nearby_places(
+                    lat, lon,
+                    radius=radius,
+                    category=None if category in CATEGORY_TAGS else category,
+                    tags=CATEGORY_TAGS.get(category),
+                    limit=PLACES_LIMIT
+                )
+            st.session_state.nearby_places = places
+            st.success(f"Found {len(places)} places within {radius} m.")
         else:
             st.error("Set or detect your location first!")
 
@@ -75,7 +71,7 @@ with col1:
 
         for place in st.session_state.nearby_places:
             folium.Marker(
-                [place["lat"], place["lon"]],
+                [place["latitude"], place["longitude"]],
                 popup=f"{place['name']} ({place['type']})"
             ).add_to(m)
 
@@ -110,15 +106,17 @@ with col2:
     if st.session_state.nearby_places:
         st.subheader("Nearby Places")
         for place in st.session_state.nearby_places:
-            with st.expander(f"{place['name']} ({place['type']})"):
-                st.write(f"Location: {place['lat']}, {place['lon']}")
-                if st.button(f"Center map on {place['name']}", key=place["name"]):
+            with st.expander(f"{place['name']} ({place['type']}) · {place['distance']:.0f} m"):
+                st.write(f"Location: {place['latitude']}, {place['longitude']}")
+                if place.get('opening_hours'):
+                    st.write(f"Opening hours: {place['opening_hours']}")
+                if st.button(f"Center map on {place['name']}", key=f"{place['name']}-{place['latitude']}-{place['longitude']}"):
                     st.session_state.current_location = {
-                        "lat": place["lat"],
-                        "lon": place["lon"]
+                        "lat": place["latitude"],
+                        "lon": place["longitude"]
                     }
                     st.rerun()
 
 # Footer
 st.markdown("---")
-st.markdown("<center><small>Powered by Photon API + OpenStreetMap</small></center>", unsafe_allow_html=True)
+st.markdown("<center><small>Powered by Overpass API + OpenStreetMap</small></center>", unsafe_allow_html=True)
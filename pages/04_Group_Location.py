@@ -9,9 +9,13 @@ from utils.map_utils import (
 from utils.location_utils import (
     create_group,
     add_group_member,
-    get_group_members
+    get_group_snapshot,
+    create_tracking_session,
+    add_location_point
 )
 from utils.api_utils import get_current_location
+from utils import live_utils
+from utils.live_utils import get_broker, start_server_thread
 
 # Page configuration
 st.set_page_config(
@@ -20,6 +24,9 @@ st.set_page_config(
     layout="wide"
 )
 
+# Websocket fan-out for external viewers, sharing this process's broker
+start_server_thread()
+
 # Initialize session state
 if 'current_location' not in st.session_state:
     st.session_state.current_location = None
@@ -29,6 +36,22 @@ if 'active_group' not in st.session_state:
     st.session_state.active_group = None
 if 'group_members' not in st.session_state:
     st.session_state.group_members = []
+if 'tracking_session' not in st.session_state:
+    st.session_state.tracking_session = None
+if 'group_subscription' not in st.session_state:
+    st.session_state.group_subscription = None
+
+# Apply member positions pushed since the last rerun; only the newest
+# update per member is kept, and no database read is needed
+if st.session_state.group_subscription:
+    updates = {update['user_id']: update for update in st.session_state.group_subscription.poll()}
+    if set(updates) - {member['id'] for member in st.session_state.group_members}:
+        # Someone joined after the group was activated: reload the (cached) member list
+        st.session_state.group_members = get_group_snapshot(st.session_state.active_group['id'])
+    for member in st.session_state.group_members:
+        update = updates.get(member['id'])
+        if update:
+            member['location'] = {key: value for key, value in update.items() if key != 'user_id'}
 
 # Page title
 st.title("Group Location Sharing")
@@ -83,8 +106,13 @@ with st.sidebar:
             min_value=5,
             max_value=60,
             value=10,
-            step=5
+            step=5,
+            help="The map also refreshes as soon as a member shares a position"
         )
+        if live_utils.server_error:
+            st.caption(f"Live server unavailable: {live_utils.server_error}")
+        else:
+            st.caption(f"Live server: ws://{live_utils.LIVE_HOST}:{live_utils.LIVE_PORT}")
 
 # Main content area
 col1, col2 = st.columns([2, 1])
@@ -92,12 +120,19 @@ col1, col2 = st.columns([2, 1])
 with col1:
     # Map display
     if st.session_state.active_group:
-        # Create and display map
-        m = create_base_map(
-            center_lat=st.session_state.current_location['latitude'],
-            center_lon=st.session_state.current_location['longitude'],
-            zoom_start=15
+        # Center on our location, else on the first member with a position
+        center = st.session_state.current_location or next(
+            (member['location'] for member in st.session_state.group_members if 'location' in member),
+            None
         )
+        if center:
+            m = create_base_map(
+                center_lat=center['latitude'],
+                center_lon=center['longitude'],
+                zoom_start=15
+            )
+        else:
+            m = create_base_map()
         
         # Add member locations
         for member in st.session_state.group_members:
@@ -129,7 +164,11 @@ with col2:
                 
                 if st.button(f"Activate {group['name']}"):
                     st.session_state.active_group = group
-                    st.session_state.group_members = get_group_members(group['id'])
+                    st.session_state.group_members = get_group_snapshot(group['id'])
+                    if st.session_state.group_subscription:
+                        st.session_state.group_subscription.close()
+                    # Positions are already in the snapshot, so start with an empty mailbox
+                    st.session_state.group_subscription = get_broker().subscribe(group['id'], snapshot=False)
                     st.experimental_rerun()
     else:
         st.info("Create or join a group to start sharing locations")
@@ -151,6 +190,15 @@ with col2:
             location = get_current_location()
             if location:
                 st.session_state.current_location = location
+                # Recording the point updates our entry in every group snapshot
+                if st.session_state.tracking_session is None:
+                    st.session_state.tracking_session = create_tracking_session(1)  # Using user_id 1 for demo
+                add_location_point(
+                    st.session_state.tracking_session,
+                    location['latitude'],
+                    location['longitude'],
+                    location.get('accuracy')
+                )
                 st.success("Location shared!")
             else:
                 st.error("Could not get your location")
@@ -173,4 +221,17 @@ st.markdown("""
     <div style='text-align: center'>
         <p>Group location sharing is end-to-end encrypted. Your privacy is our priority.</p>
     </div>
-""", unsafe_allow_html=True) 
\ No newline at end of file
+""", unsafe_allow_html=True) 
+
+# Live refresh: rerun when a member's position arrives, or at the latest
+# after the update interval. The status line is redrawn every tick, which
+# lets Streamlit interrupt the wait as soon as the user interacts.
+subscription = st.session_state.group_subscription
+if subscription and not subscription.closed:
+    status = st.empty()
+    deadline = time.monotonic() + update_interval
+    while time.monotonic() < deadline and not subscription.closed:
+        status.caption(f"🟢 Live · refreshing in {deadline - time.monotonic():.0f}s")
+        if subscription.wait(timeout=min(1.0, max(deadline - time.monotonic(), 0))):
+            break
+    st.rerun()
@@ -2,14 +2,16 @@ import streamlit as st
 import pandas as pd
 import random
 import time
-from datetime import datetime
+from datetime import datetime, timezone
 import plotly.express as px
 import plotly.graph_objects as go
-from supabase import create_client, Client
-from utils.database import FlagGameDatabase
+from utils.database import get_flag_database, get_registry
+from utils.stats_utils import get_stats_layer
+from utils.spool_utils import get_spool
+from utils.cache_utils import get_swr_cache
 
 # Initialize database
-db = FlagGameDatabase()
+db = get_flag_database()
 
 # Page configuration
 st.set_page_config(page_title="🌍 Flag Guesser", page_icon="🌍", layout="wide")
@@ -144,59 +146,101 @@ def end_game():
     final_score = st.session_state.score + time_bonus + accuracy_bonus
     st.session_state.final_score = final_score
 
+# Scores are written to a local spool first and sent to Supabase in the background
+score_spool = get_spool('flag_leaderboard', db.insert_scores)
+
 def save_game_score(player_name, score, correct_answers, total_questions, accuracy, time_taken, difficulty):
     try:
-        if db and db.supabase:
-            result = db.supabase.table('flag_leaderboard').insert({
-                'player_name': player_name,
-                'score': score,
-                'correct_answers': correct_answers,
-                'total_questions': total_questions,
-                'accuracy': accuracy,
-                'time_taken': time_taken,
-                'difficulty': difficulty
-                # game_date will be set automatically by DEFAULT NOW()
-            }).execute()
-            
-            # Check if the insert was successful
-            if result.data:
-                return True
-            else:
-                st.error(f"Failed to save score: {result}")
-                return False
-                
+        game = score_spool.enqueue({
+            'player_name': player_name,
+            'score': score,
+            'correct_answers': correct_answers,
+            'total_questions': total_questions,
+            'accuracy': accuracy,
+            'time_taken': time_taken,
+            'difficulty': difficulty,
+            # Time the game was played, not when the spool delivered it
+            'game_date': datetime.now(timezone.utc).isoformat()
+        })
+        game_stats.record(game)
+        leaderboard_cache.invalidate()
+        return True
     except Exception as e:
         st.error(f"Error saving score: {str(e)}")
         return False
     
+def fetch_leaderboard(limit, difficulty_filter):
+    """Query the top scores from Supabase (loader for the leaderboard cache)"""
+    if not (db and db.supabase):
+        raise ConnectionError("Database connection unavailable")
+    columns = 'player_name, score, accuracy, difficulty, game_date'
+    if db.check_idempotency_key():
+        # Lets get_leaderboard tell spooled scores that already arrived
+        columns += ', idempotency_key'
+    query = db.supabase.table('flag_leaderboard')\
+        .select(columns)\
+        .order('score', desc=True)\
+        .limit(limit)
+    
+    if difficulty_filter:
+        query = query.eq('difficulty', difficulty_filter)
+        
+    return query.execute().data
+
+# Shared by every session; stale results are served while they refresh in the background
+leaderboard_cache = get_swr_cache('flag_leaderboard', fetch_leaderboard)
+# Spooled scores are merged in below until they reach Supabase
+score_spool.on_sent = lambda rows: leaderboard_cache.invalidate()
+if db and db.supabase:
+    # Warm the default view so the leaderboard tab does not wait on its first load
+    leaderboard_cache.prefetch((10, None))
+
 def get_leaderboard(limit=10, difficulty_filter=None):
     try:
         if db and db.supabase:
-            query = db.supabase.table('flag_leaderboard')\
-                .select('player_name, score, accuracy, difficulty, game_date')\
-                .order('score', desc=True)\
-                .limit(limit)
+            leaderboard = leaderboard_cache.get(limit, difficulty_filter)
             
-            if difficulty_filter:
-                query = query.eq('difficulty', difficulty_filter)
-                
-            response = query.execute()
-            return response.data
+            # Scores saved in this process that are still waiting in the spool
+            synced = {row['idempotency_key'] for row in leaderboard} if db.has_idempotency_key else set()
+            pending = [
+                game for game in score_spool.pending()
+                if game['idempotency_key'] not in synced
+                and (not difficulty_filter or game['difficulty'] == difficulty_filter)
+            ]
+            if pending:
+                leaderboard = sorted(leaderboard + pending, key=lambda row: row['score'], reverse=True)[:limit]
+            return leaderboard
     except Exception as e:
         st.error(f"Error fetching leaderboard: {str(e)}")
     return []
 
+def load_all_games(page_size=1000):
+    """Yield every flag_leaderboard row, a page at a time (used to seed the stats layer)"""
+    start = 0
+    while True:
+        response = db.supabase.table('flag_leaderboard')\
+            .select('*')\
+            .order('game_date')\
+            .range(start, start + page_size - 1)\
+            .execute()
+        yield from response.data
+        if len(response.data) < page_size:
+            break
+        start += page_size
+    # Saved games the spool has not delivered yet
+    yield from score_spool.pending()
+
+# Aggregates are loaded once per process and then updated by save_game_score
+game_stats = get_stats_layer('flag_leaderboard', load_all_games)
+
 def get_leaderboard_stats():
-    """Get comprehensive statistics for the statistics tab"""
+    """Get aggregated statistics for the statistics tab"""
     try:
         if db and db.supabase:
-            response = db.supabase.table('flag_leaderboard')\
-                .select('*')\
-                .execute()
-            return response.data
+            return game_stats.get()
     except Exception as e:
         st.error(f"Error fetching statistics: {str(e)}")
-    return []
+    return None
 
 # Main UI
 st.title("🌍 Flag Guesser Game")
@@ -221,6 +265,27 @@ with st.sidebar:
     if st.button("🔄 Refresh Leaderboard"):
         st.rerun()
 
+    st.header("🗄️ Score Spool")
+    spool_status = score_spool.status()
+    st.metric("Waiting to sync", spool_status['depth'])
+    if spool_status['depth']:
+        st.caption(f"Oldest: {spool_status['oldest_age']:.0f}s ago · attempts: {spool_status['max_attempts']}")
+    st.caption(f"Synced this session: {spool_status['sent']} · failed batches: {spool_status['failures']}")
+    if spool_status['last_error'] and spool_status['depth']:
+        st.warning(f"Last sync error: {spool_status['last_error']}")
+    if db.schema_error:
+        st.error(db.schema_error)
+
+    with st.expander("🔌 Connections"):
+        for name, metrics in get_registry().metrics().items():
+            st.caption(
+                f"{name}: {metrics['created']} opened · {metrics['open']} open ({metrics['idle']} idle) · "
+                f"{metrics['reused']} reused "
+                f"({metrics['reuse_rate']:.0%}) · {metrics['reconnects']} reconnects"
+            )
+            if metrics['consecutive_failures']:
+                st.warning(f"{name}: {metrics['last_error']}")
+
 # Main content area
 if db and db.supabase:
     tab1, tab2, tab3 = st.tabs(["🎯 Play Game", "🏆 Leaderboard", "📈 Statistics"])
@@ -405,48 +470,47 @@ with tab3:
     with st.spinner("Loading statistics..."):
         stats_data = get_leaderboard_stats()
     
-    if not stats_data:
+    if not stats_data or not stats_data['total_games']:
         st.info("📊 No data available yet. Play some games to see statistics!")
     else:
-        # Convert to DataFrame for easier manipulation
-        df = pd.DataFrame(stats_data)
-        
         # Overall statistics
         col1, col2, col3, col4 = st.columns(4)
         
         with col1:
-            st.metric("Total Games", len(df))
+            st.metric("Total Games", stats_data['total_games'])
         
         with col2:
-            st.metric("Average Score", f"{df['score'].mean():.0f}")
+            st.metric("Average Score", f"{stats_data['avg_score']:.0f}")
         
         with col3:
-            st.metric("Highest Score", f"{df['score'].max()}")
+            st.metric("Highest Score", f"{stats_data['max_score']}")
         
         with col4:
-            st.metric("Average Accuracy", f"{df['accuracy'].mean():.1f}%")
+            st.metric("Average Accuracy", f"{stats_data['avg_accuracy']:.1f}%")
         
         # Charts
         col1, col2 = st.columns(2)
         
         with col1:
-            # Score distribution
-            fig_hist = px.histogram(
-                df, 
-                x='score', 
-                nbins=20,
+            # Score distribution from the fixed-bin histogram
+            histogram = pd.DataFrame(stats_data['histogram'])
+            histogram['score'] = histogram['start'].astype(str) + '–' + histogram['end'].astype(str)
+            fig_hist = px.bar(
+                histogram,
+                x='score',
+                y='games',
                 title="Score Distribution",
                 color_discrete_sequence=['#1f77b4']
             )
-            fig_hist.update_layout(showlegend=False)
+            fig_hist.update_layout(showlegend=False, bargap=0)
             st.plotly_chart(fig_hist, use_container_width=True)
         
         with col2:
             # Difficulty distribution
-            difficulty_counts = df['difficulty'].value_counts()
+            by_difficulty = stats_data['by_difficulty']
             fig_pie = px.pie(
-                values=difficulty_counts.values, 
-                names=difficulty_counts.index,
+                values=[stats['games'] for stats in by_difficulty.values()],
+                names=list(by_difficulty.keys()),
                 title="Games by Difficulty"
             )
             st.plotly_chart(fig_pie, use_container_width=True)
@@ -454,22 +518,17 @@ with tab3:
         # Performance by difficulty
         st.subheader("📊 Performance by Difficulty")
         
-        difficulty_stats = df.groupby('difficulty').agg({
-            'score': ['mean', 'max'],
-            'accuracy': 'mean',
-            'time_taken': 'mean'
-        }).round(1)
+        difficulty_stats = pd.DataFrame.from_dict(by_difficulty, orient='index')[
+            ['avg_score', 'max_score', 'avg_accuracy', 'avg_time']
+        ].round(1)
         
         difficulty_stats.columns = ['Avg Score', 'Max Score', 'Avg Accuracy (%)', 'Avg Time (s)']
         st.dataframe(difficulty_stats, use_container_width=True)
         
-  # Recent activity
+        # Recent activity
         st.subheader("🕒 Recent Activity")
-        df['game_date'] = pd.to_datetime(df['game_date'], errors='coerce')
-        recent_games = df.nlargest(5, 'game_date')
-
         
-        for _, game in recent_games.iterrows():
+        for game in stats_data['recent_games'][:5]:
             with st.container():
                 col1, col2, col3, col4 = st.columns([2, 1, 1, 2])
                 
@@ -485,4 +544,4 @@ with tab3:
                 with col4:
                     st.write(f"{game['difficulty'].title()} • {str(game['game_date'])[:16]}")
                 
-                st.divider()
\ No newline at end of file
+                st.divider()
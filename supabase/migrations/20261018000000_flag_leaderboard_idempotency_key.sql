@@ -0,0 +1,8 @@
+-- Idempotency keys for Flag Guesser scores delivered by the local score spool
+-- (utils/spool_utils.py). The spool upserts with on_conflict=idempotency_key,
+-- so a batch retried after a lost response is not stored twice. Rows saved
+-- before this migration keep a NULL key; NULLs do not conflict.
+ALTER TABLE flag_leaderboard ADD COLUMN IF NOT EXISTS idempotency_key text;
+
+CREATE UNIQUE INDEX IF NOT EXISTS flag_leaderboard_idempotency_key_idx
+    ON flag_leaderboard (idempotency_key);
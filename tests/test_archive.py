@@ -0,0 +1,48 @@
+"""Archived sessions read back like live ones and keep no per-point rows."""
+import numpy as np
+import pytest
+
+from utils import location_utils
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(location_utils, 'DB_PATH', str(tmp_path / 'location_services.db'))
+    yield location_utils.get_connection()
+    location_utils.close_connection()
+
+
+@pytest.fixture
+def ended_session(db):
+    rng = np.random.default_rng(7)
+    lats = 52.52 + np.cumsum(rng.normal(0, 2e-4, 301))
+    lons = 13.405 + np.cumsum(rng.normal(0, 2e-4, 301))
+    token = location_utils.create_tracking_session(1)
+    location_utils.add_location_points(token, [
+        (lat, lon, 5.0, 1700000000 + i) for i, (lat, lon) in enumerate(zip(lats.tolist(), lons.tolist()))
+    ])
+    location_utils.end_tracking_session(token)
+    return token
+
+
+@pytest.mark.parametrize('resolution', [10, 50, 1000])
+def test_archive_drops_rollup_rows_and_rebuilds_levels(db, ended_session, resolution):
+    live = location_utils.get_location_history(ended_session, resolution=resolution)
+    bounded = location_utils.get_location_history(
+        ended_session, since='2023-11-14 22:15:00', until='2023-11-14 22:16:00', resolution=resolution
+    )
+
+    assert location_utils.archive_session(ended_session)
+    assert db.execute('SELECT COUNT(*) FROM location_rollups').fetchone()[0] == 0
+    assert db.execute('SELECT COUNT(*) FROM location_points').fetchone()[0] == 0
+
+    archived = location_utils.get_location_history(ended_session, resolution=resolution)
+    assert [p['timestamp'] for p in archived] == [p['timestamp'] for p in live]
+    assert [p['latitude'] for p in archived] == pytest.approx([p['latitude'] for p in live], abs=1e-6)
+    archived_bounded = location_utils.get_location_history(
+        ended_session, since='2023-11-14 22:15:00', until='2023-11-14 22:16:00', resolution=resolution
+    )
+    assert [p['timestamp'] for p in archived_bounded] == [p['timestamp'] for p in bounded]
+
+    arrays = location_utils.get_location_history(ended_session, resolution=resolution, as_arrays=True)
+    assert len(arrays['latitude']) == len(live)
@@ -0,0 +1,56 @@
+"""SQLite connections are pooled across short-lived threads."""
+import threading
+
+import pytest
+
+from utils import location_utils
+from utils.database import get_registry
+
+
+@pytest.fixture
+def db_name(tmp_path, monkeypatch):
+    monkeypatch.setattr(location_utils, 'DB_PATH', str(tmp_path / 'location_services.db'))
+    location_utils.get_connection()
+    yield f"sqlite:{location_utils.DB_PATH}"
+    location_utils.close_connection()
+
+
+def _in_thread(target):
+    thread = threading.Thread(target=target)
+    thread.start()
+    thread.join()
+
+
+def test_threads_reuse_pooled_connections(db_name):
+    token = location_utils.create_tracking_session(1)
+    for _ in range(20):
+        _in_thread(lambda: location_utils.add_location_points(token, [(52.5, 13.4, 5.0)]))
+
+    metrics = get_registry().metrics()[db_name]
+    # The test thread's connection plus one shared by the sequential threads
+    assert metrics['created'] == 2
+    assert metrics['open'] == 2
+    assert metrics['idle'] == 1
+    assert len(location_utils.get_location_history(token)) == 20
+
+
+def test_connection_returned_mid_transaction_is_rolled_back(db_name):
+    def abandon():
+        conn = location_utils.get_connection()
+        conn.execute('BEGIN IMMEDIATE')
+        conn.execute("INSERT INTO users (username) VALUES ('ghost')")
+
+    _in_thread(abandon)
+
+    conn = location_utils.get_connection()
+    conn.execute("INSERT INTO users (username) VALUES ('alice')")
+    assert [name for name, in conn.execute('SELECT username FROM users')] == ['alice']
+
+
+def test_close_connection_closes_idle_connections(db_name):
+    _in_thread(location_utils.get_connection)
+    location_utils.close_connection()
+
+    metrics = get_registry().metrics()[db_name]
+    assert metrics['open'] == 0
+    assert metrics['idle'] == 0
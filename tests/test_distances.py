@@ -0,0 +1,18 @@
+"""calculate_distances against geopy's geodesic."""
+import numpy as np
+import pytest
+from geopy.distance import geodesic
+
+from utils.api_utils import calculate_distances
+
+
+@pytest.mark.parametrize('lats, lons', [
+    (0.5, 179.7),  # scalar, nearly antipodal: Vincenty does not converge
+    ([0.5, 10.0], [179.7, 20.0]),
+])
+def test_geodesic_matches_geopy_including_antipodal(lats, lons):
+    distances = calculate_distances(0.0, 0.0, lats, lons, mode='geodesic')
+
+    assert np.shape(distances) == np.shape(lats)
+    expected = [geodesic((0.0, 0.0), point).meters for point in zip(np.atleast_1d(lats), np.atleast_1d(lons))]
+    assert np.atleast_1d(distances) == pytest.approx(expected, abs=0.01)
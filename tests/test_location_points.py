@@ -0,0 +1,33 @@
+"""add_location_points validation."""
+import pytest
+
+from utils import location_utils
+
+
+@pytest.fixture
+def session(tmp_path, monkeypatch):
+    monkeypatch.setattr(location_utils, 'DB_PATH', str(tmp_path / 'location_services.db'))
+    yield location_utils.create_tracking_session(1)
+    location_utils.close_connection()
+
+
+@pytest.mark.parametrize('timestamp', ['garbage', '2024-13-01 00:00:00', float('nan'), 1e20, [2024]])
+def test_unparseable_timestamp_is_rejected(session, timestamp):
+    accepted = location_utils.add_location_points(session, [
+        (52.5, 13.4, 5.0, '2024-01-01 10:00:00'),
+        {'latitude': 52.6, 'longitude': 13.5, 'timestamp': timestamp},
+    ])
+
+    assert accepted == [True, False]
+    history = location_utils.get_location_history(session)
+    assert [point['timestamp'] for point in history] == ['2024-01-01 10:00:00']
+
+
+def test_iso_timestamps_are_stored_in_utc(session):
+    location_utils.add_location_points(session, [
+        (52.5, 13.4, None, '2024-01-01T12:00:00+02:00'),
+        (52.5, 13.4, None, '2024-01-01T11:00:00Z'),
+    ])
+
+    history = location_utils.get_location_history(session)
+    assert [point['timestamp'] for point in history] == ['2024-01-01 10:00:00', '2024-01-01 11:00:00']
@@ -0,0 +1,26 @@
+"""Hot-path location queries must stay index-backed after migrations."""
+import pytest
+
+from utils import location_utils
+
+
+@pytest.fixture
+def migrated_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(location_utils, 'DB_PATH', str(tmp_path / 'location_services.db'))
+    location_utils.get_connection()  # creates the schema and runs every migration
+    yield location_utils.DB_PATH
+    location_utils.close_connection()
+
+
+def test_all_hot_paths_use_their_indexes(migrated_db):
+    assert location_utils.check_query_plans() == {}
+
+
+@pytest.mark.parametrize('name', sorted(location_utils.HOT_PATH_QUERIES))
+def test_hot_path_query_plan(migrated_db, name):
+    sql, params, index = location_utils.HOT_PATH_QUERIES[name]
+    plan = location_utils.explain_query_plan(sql, params)
+
+    assert any(index in line for line in plan), plan
+    assert not any(line.startswith('SCAN') for line in plan), plan
+    assert not any('TEMP B-TREE' in line for line in plan), plan
@@ -0,0 +1,73 @@
+"""get_route / get_route_matrix against the local OSRM stand-in (benchmarks/osrm_stub.py)."""
+import pytest
+
+from benchmarks.osrm_stub import OSRMStubHandler, start_stub
+from utils import api_utils
+from utils.cache_utils import GeoCache
+
+ORIGINS = [(52.50 + i * 0.01, 13.40) for i in range(4)]
+DESTINATIONS = [(52.52, 13.30 + j * 0.01) for j in range(5)]
+
+
+@pytest.fixture(scope='module')
+def osrm_server():
+    server = start_stub()
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture
+def osrm(osrm_server, monkeypatch, tmp_path):
+    """Point api_utils at the stub with an empty route cache; yields a request counter."""
+    monkeypatch.setattr(api_utils, 'OSRM_BASE_URL', f"http://127.0.0.1:{osrm_server.server_port}")
+    monkeypatch.setattr(api_utils, 'route_cache', GeoCache('routes', db_path=str(tmp_path / 'cache.db')))
+    monkeypatch.setattr(OSRMStubHandler, 'error_code', None)
+    start = OSRMStubHandler.requests_served
+    yield lambda: OSRMStubHandler.requests_served - start
+
+
+def test_matrix_matches_pairwise_routes(osrm):
+    matrix = api_utils.get_route_matrix(ORIGINS, DESTINATIONS)
+    assert osrm() == 1
+
+    for i, origin in enumerate(ORIGINS):
+        for j, destination in enumerate(DESTINATIONS):
+            route = api_utils.get_route(*origin, *destination)
+            assert matrix['distances'][i][j] == pytest.approx(route['distance'], abs=0.01)
+            assert matrix['durations'][i][j] == pytest.approx(route['duration'], abs=0.01)
+
+
+def test_matrix_splits_blocks_above_coordinate_limit(osrm, monkeypatch):
+    expected = api_utils.get_route_matrix(ORIGINS, DESTINATIONS)
+    assert osrm() == 1
+
+    monkeypatch.setattr(api_utils, 'OSRM_TABLE_MAX_COORDS', 4)
+    split = api_utils.get_route_matrix(ORIGINS, DESTINATIONS)
+    # 2 origins x 2 destinations per request: 2 x 3 blocks
+    assert osrm() == 1 + 6
+    assert split == expected
+
+
+def test_matrix_returns_none_on_error_code(osrm, monkeypatch):
+    monkeypatch.setattr(OSRMStubHandler, 'error_code', 'NoTable')
+    assert api_utils.get_route_matrix(ORIGINS, DESTINATIONS) is None
+
+
+def test_route_returns_none_on_error_code(osrm, monkeypatch):
+    monkeypatch.setattr(OSRMStubHandler, 'error_code', 'NoRoute')
+    assert api_utils.get_route(52.5, 13.4, 52.52, 13.3) is None
+
+
+def test_route_cache_hit_uses_snapped_coordinates(osrm):
+    first = api_utils.get_route(52.500001, 13.400001, 52.520001, 13.300001)
+    assert osrm() == 1
+
+    # Within the same ~11 m grid cell at both ends: served from the cache
+    second = api_utils.get_route(52.500004, 13.399996, 52.519996, 13.300004, decode_geometry=True)
+    assert osrm() == 1
+    assert second['distance'] == first['distance']
+    assert second['coordinates'].shape == (2, 2)
+
+    # A different cell is fetched
+    api_utils.get_route(52.5002, 13.4, 52.52, 13.3)
+    assert osrm() == 2
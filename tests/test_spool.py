@@ -0,0 +1,28 @@
+"""Spool delivery: each row is sent once, even with concurrent flushes."""
+import threading
+import time
+
+from utils.spool_utils import Spool
+
+
+def test_concurrent_flushes_send_each_row_once(tmp_path):
+    sent = []
+
+    def send_batch(rows):
+        time.sleep(0.1)  # keep the batch in flight while the other flushes start
+        sent.extend(row['idempotency_key'] for row in rows)
+
+    spool = Spool('scores', send_batch, db_path=str(tmp_path / 'spool.db'), flush_interval=0.01)
+    for score in range(5):
+        spool.enqueue({'score': score})
+
+    flushes = [threading.Thread(target=spool.flush) for _ in range(3)]
+    for flush in flushes:
+        flush.start()
+    for flush in flushes:
+        flush.join()
+    spool.stop()
+
+    assert len(sent) == 5
+    assert len(set(sent)) == 5
+    assert spool.pending() == []
@@ -1,25 +1,83 @@
-import requests
 import os
-from typing import Dict, List, Optional, Tuple
+import math
+import threading
+from operator import itemgetter
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+import numpy as np
 from geopy.distance import geodesic
 from geopy.geocoders import Nominatim
 import json
 from datetime import datetime
 import time
+from utils.cache_utils import GeoCache
+from utils.geometry_utils import decode_polyline
+from utils.http_utils import http_get, http_post, get_timeout, iter_json_array
+from utils.timezone_utils import (
+    get_resolver,
+    nautical_timezone,
+    resolve_timezone,
+    timezone_details
+)
 
 # API Keys (should be in .env file)
 GEOAPIFY_KEY = os.getenv("GEOAPIFY_KEY", "")
 
+# Earth model for distance calculations
+EARTH_RADIUS_M = 6371008.8  # mean radius
+WGS84_A = 6378137.0
+WGS84_F = 1 / 298.257223563
+# Nearby search radii are a few km, where this matches haversine accuracy
+NEARBY_DISTANCE_MODE = 'equirectangular'
+
+METERS_PER_DEGREE = 111320.0  # along a meridian, approximately
+
+# Overpass POIs are cached in fixed-size tiles (0.01 deg is ~1.1 km north-south)
+OVERPASS_URL = "https://overpass-api.de/api/interpreter"
+OVERPASS_TILE_SIZE = 0.01
+OVERPASS_TILE_TTL = int(os.getenv("OVERPASS_TILE_TTL", str(24 * 3600)))
+POI_TAGS = ('name', 'amenity', 'shop', 'leisure', 'tourism', 'opening_hours', 'phone', 'website')
+# Part of every tile key; bump when the query or POI_TAGS change what a tile holds
+OVERPASS_TILE_VERSION = 2
+
+# Routing (point OSRM_BASE_URL at a self-hosted server in production)
+OSRM_BASE_URL = os.getenv("OSRM_BASE_URL", "http://router.project-osrm.org").rstrip('/')
+OSRM_PROFILE = os.getenv("OSRM_PROFILE", "driving")
+OSRM_TABLE_MAX_COORDS = int(os.getenv("OSRM_TABLE_MAX_COORDS", "100"))
+ROUTE_SNAP_DECIMALS = 4
+ROUTE_CACHE_TTL = int(os.getenv("ROUTE_CACHE_TTL", str(24 * 3600)))
+
+# Reverse-geocode results keyed by geohash cell
+reverse_geocode_cache = GeoCache("reverse_geocode")
+location_details_cache = GeoCache("location_details")
+overpass_tile_cache = GeoCache("overpass_tiles", ttl=OVERPASS_TILE_TTL, memory_entries=4096)
+route_cache = GeoCache("routes", ttl=ROUTE_CACHE_TTL)
+
+# Shared pool for concurrent lookups in enrich_location
+_enrich_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="enrich")
+ENRICH_TIMEOUT = 5.0  # seconds
+ENRICH_RESULT_TTL = 300.0  # seconds a finished, uncollected lookup is kept
+# Lookups by (part, lat, lon, radius), so asking again joins them. Finished
+# ones stay until a caller collects them or ENRICH_RESULT_TTL passes.
+_enrich_inflight: Dict[Tuple, Future] = {}
+_enrich_finished_at: Dict[Tuple, float] = {}
+_enrich_inflight_lock = threading.Lock()
+
+_geolocator = Nominatim(
+    user_agent="location_services_app",
+    timeout=get_timeout('nominatim')[1]
+)
+
 def get_current_location() -> Optional[Dict]:
     """Get current location using browser geolocation API."""
     # This function will be called from JavaScript in the frontend
     return None
 
+@reverse_geocode_cache.cached
 def reverse_geocode(lat: float, lon: float) -> Optional[Dict]:
     """Get address information from coordinates using Nominatim."""
     try:
-        geolocator = Nominatim(user_agent="location_services_app")
-        location = geolocator.reverse(f"{lat}, {lon}")
+        location = _geolocator.reverse(f"{lat}, {lon}")
         
         if location:
             address = location.raw.get('address', {})
@@ -35,68 +93,232 @@ def reverse_geocode(lat: float, lon: float) -> Optional[Dict]:
     
     return None
 
+def _radius_bbox(lat: float, lon: float, radius: float) -> Tuple[float, float, float, float]:
+    """Return a (south, west, north, east) box enclosing a circle around a point."""
+    # Padded by 1% so points on the circle are never cut off by rounding
+    lat_delta = radius * 1.01 / METERS_PER_DEGREE
+    lon_delta = radius * 1.01 / (METERS_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01))
+    return (lat - lat_delta, lon - lon_delta, lat + lat_delta, lon + lon_delta)
+
+def _tiles_for_radius(lat: float, lon: float, radius: float) -> List[Tuple[int, int]]:
+    """Return the Overpass cache tiles covering a circle around a point."""
+    south, west, north, east = _radius_bbox(lat, lon, radius)
+    row0 = math.floor(south / OVERPASS_TILE_SIZE)
+    row1 = math.floor(north / OVERPASS_TILE_SIZE)
+    col0 = math.floor(west / OVERPASS_TILE_SIZE)
+    col1 = math.floor(east / OVERPASS_TILE_SIZE)
+    return [(row, col) for row in range(row0, row1 + 1) for col in range(col0, col1 + 1)]
+
+def _filter_key(category: Optional[str], tags: Optional[Dict[str, Optional[str]]]) -> str:
+    """Cache namespace for a category/tag filter; '*' means unfiltered."""
+    if not category and not tags:
+        return '*'
+    parts = [category or '']
+    parts.extend(f"{key}={value}" if value is not None else key for key, value in sorted((tags or {}).items()))
+    return '|'.join(parts)
+
+def _tile_key(tile: Tuple[int, int], filter_key: str = '*') -> str:
+    return f"v{OVERPASS_TILE_VERSION}:{OVERPASS_TILE_SIZE}:{filter_key}:{tile[0]}:{tile[1]}"
+
+def _overpass_string(value: str) -> str:
+    return '"' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+def build_overpass_query(
+    bbox: Tuple[float, float, float, float],
+    category: str = None,
+    tags: Optional[Dict[str, Optional[str]]] = None,
+    timeout: int = 25
+) -> str:
+    """Build an Overpass QL query for POI nodes inside (south, west, north, east).
+
+    The category is matched against amenity/shop/leisure/tourism and extra tags are
+    added as filters (a None value only requires the tag to exist), so
+    Overpass returns just the matching nodes.
+    """
+    south, west, north, east = bbox
+    filters = ''.join(
+        f"[{_overpass_string(key)}={_overpass_string(value)}]" if value is not None
+        else f"[{_overpass_string(key)}]"
+        for key, value in sorted((tags or {}).items())
+    )
+    selectors = '\n'.join(
+        f"      node[{_overpass_string(key)}={_overpass_string(category)}]{filters};" if category
+        else f"      node[{_overpass_string(key)}]{filters};"
+        for key in ('amenity', 'shop', 'leisure', 'tourism')
+    )
+    return f"""
+    [out:json][timeout:{timeout}][bbox:{south:.6f},{west:.6f},{north:.6f},{east:.6f}];
+    (
+{selectors}
+    );
+    out body qt;
+    """
+
+def _fetch_overpass_tiles(
+    tiles: List[Tuple[int, int]],
+    category: str = None,
+    tags: Optional[Dict[str, Optional[str]]] = None
+) -> Tuple[Optional[Dict[Tuple[int, int], List]], bool]:
+    """Fetch POIs for the bounding box of the given tiles in one Overpass query.
+
+    The response is parsed as a stream, so only the compact [lat, lon, tags]
+    elements kept per tile stay in memory. Returns (elements for every tile
+    inside the bounding box, whether the result is complete); elements are
+    None if the request failed.
+    """
+    row0 = min(row for row, _ in tiles)
+    row1 = max(row for row, _ in tiles)
+    col0 = min(col for _, col in tiles)
+    col1 = max(col for _, col in tiles)
+    bbox = (
+        row0 * OVERPASS_TILE_SIZE,
+        col0 * OVERPASS_TILE_SIZE,
+        (row1 + 1) * OVERPASS_TILE_SIZE,
+        (col1 + 1) * OVERPASS_TILE_SIZE
+    )
+    query = build_overpass_query(bbox, category, tags)
+
+    response = http_post('overpass', OVERPASS_URL, data={'data': query}, stream=True)
+    if response.status_code != 200:
+        print(f"Overpass request failed with status {response.status_code}")
+        response.close()
+        return None, False
+
+    fetched = {
+        (row, col): []
+        for row in range(row0, row1 + 1)
+        for col in range(col0, col1 + 1)
+    }
+    meta = {}
+    try:
+        for element in iter_json_array(response, 'elements', provider='overpass', meta=meta):
+            elat, elon = element.get('lat'), element.get('lon')
+            if elat is None or elon is None:
+                continue
+            element_tags = element.get('tags', {})
+            tile = (math.floor(elat / OVERPASS_TILE_SIZE), math.floor(elon / OVERPASS_TILE_SIZE))
+            if tile in fetched:
+                fetched[tile].append([elat, elon, {k: element_tags[k] for k in POI_TAGS if k in element_tags}])
+    except ValueError as e:
+        print(f"Overpass response was incomplete: {e}")
+        return None, False
+
+    # Overpass answers timeouts and memory limits with 200 and a remark
+    if meta.get('remark'):
+        print(f"Overpass returned partial results: {meta['remark']}")
+        return fetched, False
+    return fetched, True
+
+def _get_poi_elements(
+    lat: float,
+    lon: float,
+    radius: float,
+    category: str = None,
+    tags: Optional[Dict[str, Optional[str]]] = None
+) -> Optional[List]:
+    """Return cached or freshly fetched POI elements for the tiles around a point.
+
+    Unfiltered tiles also satisfy category-only searches, since the category
+    is re-checked locally; tag-filtered searches need their own tiles.
+    """
+    tiles = _tiles_for_radius(lat, lon, radius)
+    filter_key = _filter_key(category, tags)
+    filter_keys = [filter_key] if filter_key == '*' or tags else ['*', filter_key]
+
+    cached = overpass_tile_cache.get_many([_tile_key(tile, key) for tile in tiles for key in filter_keys])
+    elements = []
+    missing = []
+    for tile in tiles:
+        for key in filter_keys:
+            if _tile_key(tile, key) in cached:
+                elements.extend(cached[_tile_key(tile, key)])
+                break
+        else:
+            missing.append(tile)
+
+    if missing:
+        fetched, complete = _fetch_overpass_tiles(missing, category, tags)
+        if fetched is None:
+            return None
+        # Partial results are shown for this search but never cached
+        if complete:
+            overpass_tile_cache.set_many({_tile_key(tile, filter_key): items for tile, items in fetched.items()})
+        for tile in missing:
+            elements.extend(fetched[tile])
+
+    return elements
+
+def _place_type(tags: Dict) -> str:
+    return tags.get('amenity', tags.get('shop', tags.get('leisure', tags.get('tourism', 'other'))))
+
+def _build_place(elat: float, elon: float, tags: Dict, place_type: str, distance: float) -> Dict:
+    place = {
+        'name': tags.get('name', 'Unknown'),
+        'type': place_type,
+        'latitude': elat,
+        'longitude': elon,
+        'distance': distance
+    }
+    
+    # Add additional details if available
+    if 'opening_hours' in tags:
+        place['opening_hours'] = tags['opening_hours']
+    if 'phone' in tags:
+        place['phone'] = tags['phone']
+    if 'website' in tags:
+        place['website'] = tags['website']
+    
+    return place
+
 def search_nearby_places(
     lat: float,
     lon: float,
     radius: int = 1000,
-    category: str = None
+    category: str = None,
+    tags: Optional[Dict[str, Optional[str]]] = None,
+    limit: Optional[int] = None
 ) -> List[Dict]:
-    """Search for nearby places using Overpass API."""
+    """Search for nearby places using Overpass API.
+
+    POIs are cached per map tile and filter, so only tiles not seen within
+    OVERPASS_TILE_TTL are fetched. Category and tag filters are sent to
+    Overpass; radius is applied locally with a bounding-box pre-filter
+    before exact distances. With a limit, the closest `limit` places are
+    selected in linear time and only those are sorted and turned into dicts.
+    """
     try:
-        # Overpass API query
-        query = f"""
-        [out:json][timeout:25];
-        (
-          node["amenity"](around:{radius},{lat},{lon});
-          node["shop"](around:{radius},{lat},{lon});
-          node["leisure"](around:{radius},{lat},{lon});
-        );
-        out body;
-        >;
-        out skel qt;
-        """
+        elements = _get_poi_elements(lat, lon, radius, category, tags)
+        if elements is None:
+            return []
         
-        response = requests.get(
-            "https://overpass-api.de/api/interpreter",
-            params={'data': query}
-        )
+        lats = np.fromiter(map(itemgetter(0), elements), dtype=float, count=len(elements))
+        lons = np.fromiter(map(itemgetter(1), elements), dtype=float, count=len(elements))
         
-        if response.status_code == 200:
-            data = response.json()
-            places = []
-            
-            for element in data.get('elements', []):
-                tags = element.get('tags', {})
-                place_type = tags.get('amenity', tags.get('shop', tags.get('leisure', 'other')))
-                
-                if category and place_type != category:
-                    continue
-                
-                place = {
-                    'name': tags.get('name', 'Unknown'),
-                    'type': place_type,
-                    'latitude': element.get('lat'),
-                    'longitude': element.get('lon'),
-                    'distance': calculate_distance(
-                        lat, lon,
-                        element.get('lat'),
-                        element.get('lon')
-                    )
-                }
-                
-                # Add additional details if available
-                if 'opening_hours' in tags:
-                    place['opening_hours'] = tags['opening_hours']
-                if 'phone' in tags:
-                    place['phone'] = tags['phone']
-                if 'website' in tags:
-                    place['website'] = tags['website']
-                
-                places.append(place)
-            
-            # Sort by distance
-            places.sort(key=lambda x: x['distance'])
-            return places
+        # Cheap bounding-box rejection before any distance is computed
+        south, west, north, east = _radius_bbox(lat, lon, radius)
+        indexes = np.flatnonzero((lats >= south) & (lats <= north) & (lons >= west) & (lons <= east))
+        distances = calculate_distances(lat, lon, lats[indexes], lons[indexes], mode=NEARBY_DISTANCE_MODE)
+        in_radius = distances <= radius
+        indexes, distances = indexes[in_radius], distances[in_radius]
+        
+        if category:
+            keep = [
+                _place_type(elements[index][2]) == category
+                for index in indexes.tolist()
+            ]
+            indexes, distances = indexes[keep], distances[keep]
+        
+        # Select the closest `limit` (linear-time partition), then sort only those
+        if limit is not None and limit < len(distances):
+            nearest = np.argpartition(distances, max(limit - 1, 0))[:max(limit, 0)]
+            indexes, distances = indexes[nearest], distances[nearest]
+        order = np.argsort(distances, kind='stable')
+        
+        places = []
+        for index, distance in zip(indexes[order].tolist(), distances[order].tolist()):
+            elat, elon, element_tags = elements[index]
+            places.append(_build_place(elat, elon, element_tags, _place_type(element_tags), distance))
+        return places
             
     except Exception as e:
         print(f"Error searching nearby places: {e}")
@@ -112,31 +334,201 @@ def calculate_distance(
     """Calculate distance between two points in meters."""
     return geodesic((lat1, lon1), (lat2, lon2)).meters
 
+def calculate_distances(
+    lat: Union[float, np.ndarray],
+    lon: Union[float, np.ndarray],
+    lats: Union[Sequence[float], np.ndarray],
+    lons: Union[Sequence[float], np.ndarray],
+    mode: str = 'haversine'
+) -> np.ndarray:
+    """Calculate distances in meters from (lat, lon) to many points at once.
+
+    lat/lon may be scalars or arrays broadcastable against lats/lons. Modes,
+    with error relative to the WGS-84 geodesic:
+
+    - 'geodesic': Vincenty's inverse formula on WGS-84, within 1 mm; the rare
+      nearly antipodal pairs where it does not converge use geopy's solver.
+    - 'haversine': great circle on a sphere of mean Earth radius, within 0.6%.
+    - 'equirectangular': flat-Earth approximation around the mean latitude;
+      haversine's error plus under 0.1% for distances up to ~50 km away
+      from the poles. Fastest, meant for local searches.
+    """
+    lat1 = np.radians(np.asarray(lat, dtype=float))
+    lon1 = np.radians(np.asarray(lon, dtype=float))
+    lat2 = np.radians(np.asarray(lats, dtype=float))
+    lon2 = np.radians(np.asarray(lons, dtype=float))
+
+    if mode == 'haversine':
+        a = (np.sin((lat2 - lat1) / 2) ** 2
+             + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+        return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+    if mode == 'equirectangular':
+        dlon = (lon2 - lon1 + np.pi) % (2 * np.pi) - np.pi
+        x = dlon * np.cos((lat1 + lat2) / 2)
+        return EARTH_RADIUS_M * np.hypot(x, lat2 - lat1)
+
+    if mode == 'geodesic':
+        return _vincenty_distances(lat1, lon1, lat2, lon2)
+
+    raise ValueError(f"Unknown distance mode: {mode}")
+
+def _vincenty_distances(lat1, lon1, lat2, lon2, max_iterations: int = 200) -> np.ndarray:
+    """Vectorized Vincenty inverse on the WGS-84 ellipsoid (inputs in radians)."""
+    a, f = WGS84_A, WGS84_F
+    b = a * (1 - f)
+    lat1, lon1, lat2, lon2 = np.broadcast_arrays(lat1, lon1, lat2, lon2)
+    shape = lat1.shape
+    # At least 1-d so the antipodal fallback can index scalar inputs too
+    lat1, lon1, lat2, lon2 = (np.atleast_1d(values) for values in (lat1, lon1, lat2, lon2))
+
+    L = (lon2 - lon1 + np.pi) % (2 * np.pi) - np.pi
+    U1 = np.arctan((1 - f) * np.tan(lat1))
+    U2 = np.arctan((1 - f) * np.tan(lat2))
+    sin_u1, cos_u1 = np.sin(U1), np.cos(U1)
+    sin_u2, cos_u2 = np.sin(U2), np.cos(U2)
+
+    lam = L.copy()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for _ in range(max_iterations):
+            sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+            sin_sigma = np.hypot(cos_u2 * sin_lam, cos_u1 * sin_u2 - sin_u1 * cos_u2 * cos_lam)
+            cos_sigma = sin_u1 * sin_u2 + cos_u1 * cos_u2 * cos_lam
+            sigma = np.arctan2(sin_sigma, cos_sigma)
+            sin_alpha = np.where(sin_sigma == 0, 0.0, cos_u1 * cos_u2 * sin_lam / sin_sigma)
+            cos2_alpha = 1 - sin_alpha ** 2
+            cos_2sm = np.where(cos2_alpha == 0, 0.0, cos_sigma - 2 * sin_u1 * sin_u2 / cos2_alpha)
+            C = f / 16 * cos2_alpha * (4 + f * (4 - 3 * cos2_alpha))
+            lam_prev = lam
+            lam = L + (1 - C) * f * sin_alpha * (
+                sigma + C * sin_sigma * (cos_2sm + C * cos_sigma * (-1 + 2 * cos_2sm ** 2))
+            )
+            diverging = np.abs(lam - lam_prev) > 1e-12
+            if not np.any(diverging & ~np.isnan(lam)):
+                break
+
+        u2 = cos2_alpha * (a ** 2 - b ** 2) / b ** 2
+        A = 1 + u2 / 16384 * (4096 + u2 * (-768 + u2 * (320 - 175 * u2)))
+        B = u2 / 1024 * (256 + u2 * (-128 + u2 * (74 - 47 * u2)))
+        delta_sigma = B * sin_sigma * (cos_2sm + B / 4 * (
+            cos_sigma * (-1 + 2 * cos_2sm ** 2)
+            - B / 6 * cos_2sm * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sm ** 2)
+        ))
+        distances = b * A * (sigma - delta_sigma)
+
+    # Nearly antipodal points: fall back to geopy's (Karney) solver
+    for index in zip(*np.nonzero(diverging & ~np.isnan(lam))):
+        distances[index] = geodesic(
+            (np.degrees(lat1[index]), np.degrees(lon1[index])),
+            (np.degrees(lat2[index]), np.degrees(lon2[index]))
+        ).meters
+
+    return distances.reshape(shape)
+
+def _snap(lat: float, lon: float) -> Tuple[float, float]:
+    """Round a coordinate to the route cache grid (~11 m at 4 decimals)."""
+    return round(lat, ROUTE_SNAP_DECIMALS), round(lon, ROUTE_SNAP_DECIMALS)
+
+def _with_coordinates(route: Dict) -> Dict:
+    return {**route, 'coordinates': decode_polyline(route['geometry'])}
+
 def get_route(
     start_lat: float,
     start_lon: float,
     end_lat: float,
-    end_lon: float
+    end_lon: float,
+    decode_geometry: bool = False
 ) -> Optional[Dict]:
-    """Get route between two points using OSRM."""
+    """Get route between two points using OSRM.
+
+    Endpoints are snapped to a ~11 m grid and routes are cached per snapped
+    pair in memory and on disk. With decode_geometry, the result also has a
+    'coordinates' (n, 2) lat/lon array decoded from the polyline.
+    """
+    start_lat, start_lon = _snap(start_lat, start_lon)
+    end_lat, end_lon = _snap(end_lat, end_lon)
+    key = f"{OSRM_PROFILE}:{start_lat},{start_lon};{end_lat},{end_lon}"
+    found, cached = route_cache.get_key(key)
+    if found:
+        return _with_coordinates(cached) if decode_geometry else cached
+
     try:
-        url = f"http://router.project-osrm.org/route/v1/driving/{start_lon},{start_lat};{end_lon},{end_lat}"
-        response = requests.get(url)
+        url = f"{OSRM_BASE_URL}/route/v1/{OSRM_PROFILE}/{start_lon},{start_lat};{end_lon},{end_lat}"
+        response = http_get('osrm', url)
         
         if response.status_code == 200:
             data = response.json()
             if data.get('code') == 'Ok':
                 route = data['routes'][0]
-                return {
+                result = {
                     'distance': route['distance'],  # meters
                     'duration': route['duration'],  # seconds
                     'geometry': route['geometry']
                 }
+                route_cache.set_key(key, result)
+                return _with_coordinates(result) if decode_geometry else result
     except Exception as e:
         print(f"Error getting route: {e}")
     
     return None
 
+def get_route_matrix(
+    origins: Sequence[Tuple[float, float]],
+    destinations: Sequence[Tuple[float, float]]
+) -> Optional[Dict]:
+    """Get travel distances and durations from every origin to every destination.
+
+    Uses OSRM's table service, so an N x M matrix costs one request (more only
+    when N + M exceeds OSRM_TABLE_MAX_COORDS). Returns {'distances': [[m]],
+    'durations': [[s]]} indexed [origin][destination]; unreachable pairs are
+    None.
+    """
+    origins = [_snap(lat, lon) for lat, lon in origins]
+    destinations = [_snap(lat, lon) for lat, lon in destinations]
+    distances = [[None] * len(destinations) for _ in origins]
+    durations = [[None] * len(destinations) for _ in origins]
+    if not origins or not destinations:
+        return {'distances': distances, 'durations': durations}
+
+    # Split into blocks that fit the server's coordinate limit
+    if len(origins) + len(destinations) <= OSRM_TABLE_MAX_COORDS:
+        origin_block, destination_block = len(origins), len(destinations)
+    else:
+        origin_block = max(1, min(len(origins), OSRM_TABLE_MAX_COORDS // 2))
+        destination_block = max(1, OSRM_TABLE_MAX_COORDS - origin_block)
+
+    try:
+        for i in range(0, len(origins), origin_block):
+            sources = origins[i:i + origin_block]
+            for j in range(0, len(destinations), destination_block):
+                targets = destinations[j:j + destination_block]
+                coordinates = ';'.join(f"{lon},{lat}" for lat, lon in sources + targets)
+                url = f"{OSRM_BASE_URL}/table/v1/{OSRM_PROFILE}/{coordinates}"
+                params = {
+                    'sources': ';'.join(str(k) for k in range(len(sources))),
+                    'destinations': ';'.join(str(len(sources) + k) for k in range(len(targets))),
+                    'annotations': 'distance,duration'
+                }
+                response = http_get('osrm', url, params=params)
+                if response.status_code != 200:
+                    print(f"OSRM table request failed with status {response.status_code}")
+                    return None
+
+                data = response.json()
+                if data.get('code') != 'Ok':
+                    print(f"OSRM table error: {data.get('code')}")
+                    return None
+
+                for a, row in enumerate(data.get('distances', [])):
+                    distances[i + a][j:j + len(row)] = row
+                for a, row in enumerate(data.get('durations', [])):
+                    durations[i + a][j:j + len(row)] = row
+    except Exception as e:
+        print(f"Error getting route matrix: {e}")
+        return None
+
+    return {'distances': distances, 'durations': durations}
+
 def get_random_location() -> Tuple[float, float]:
     """Get a random location for the GeoGuesser game."""
     # This is a simple implementation that returns random coordinates
@@ -149,6 +541,7 @@ def get_random_location() -> Tuple[float, float]:
     
     return lat, lon
 
+@location_details_cache.cached
 def get_location_details(lat: float, lon: float) -> Optional[Dict]:
     """Get detailed location information using Geoapify."""
     if not GEOAPIFY_KEY:
@@ -163,7 +556,7 @@ def get_location_details(lat: float, lon: float) -> Optional[Dict]:
             'format': 'json'
         }
         
-        response = requests.get(url, params=params)
+        response = http_get('geoapify', url, params=params)
         
         if response.status_code == 200:
             data = response.json()
@@ -189,18 +582,38 @@ def get_weather_info(lat: float, lon: float) -> Optional[Dict]:
     return None
 
 def get_timezone_info(lat: float, lon: float) -> Optional[Dict]:
-    """Get timezone information for a location."""
+    """Get timezone information for a location.
+
+    Resolved offline from the timezone boundary dataset. TimezoneDB is only
+    queried when no dataset is installed and TIMEZONE_API_KEY is set. Points
+    that match no zone polygon of a loaded dataset (open ocean) get their
+    nautical zone; without a dataset or API key this returns None.
+    """
+    info = resolve_timezone(lat, lon)
+    if info:
+        return info
+
+    if get_resolver().loaded:
+        return timezone_details(nautical_timezone(lon))
+
+    api_key = os.getenv('TIMEZONE_API_KEY', '')
+    if api_key:
+        return _get_timezone_info_remote(lat, lon, api_key)
+    return None
+
+def _get_timezone_info_remote(lat: float, lon: float, api_key: str) -> Optional[Dict]:
+    """Get timezone information from TimezoneDB."""
     try:
-        url = f"https://api.timezonedb.com/v2.1/get-time-zone"
+        url = "https://api.timezonedb.com/v2.1/get-time-zone"
         params = {
-            'key': os.getenv('TIMEZONE_API_KEY', ''),
+            'key': api_key,
             'format': 'json',
             'by': 'position',
             'lat': lat,
             'lng': lon
         }
         
-        response = requests.get(url, params=params)
+        response = http_get('timezonedb', url, params=params)
         
         if response.status_code == 200:
             data = response.json()
@@ -208,9 +621,79 @@ def get_timezone_info(lat: float, lon: float) -> Optional[Dict]:
                 return {
                     'timezone': data.get('zoneName'),
                     'offset': data.get('gmtOffset'),
-                    'dst': data.get('dst')
+                    'dst': int(data.get('dst') or 0)
                 }
     except Exception as e:
         print(f"Error getting timezone info: {e}")
     
-    return None 
\ No newline at end of file
+    return None
+
+ENRICH_PARTS = {
+    'address': lambda lat, lon, radius: reverse_geocode(lat, lon),
+    'details': lambda lat, lon, radius: get_location_details(lat, lon),
+    'timezone': lambda lat, lon, radius: get_timezone_info(lat, lon),
+    'places': lambda lat, lon, radius: search_nearby_places(lat, lon, radius)
+}
+
+def _mark_enrich_finished(key: Tuple, future: Future) -> None:
+    with _enrich_inflight_lock:
+        if _enrich_inflight.get(key) is future:
+            _enrich_finished_at[key] = time.monotonic()
+
+def enrich_location(
+    lat: float,
+    lon: float,
+    parts: Sequence[str] = ('details', 'timezone'),
+    timeout: float = ENRICH_TIMEOUT,
+    radius: int = 1000
+) -> Dict:
+    """Run independent location lookups concurrently under one deadline.
+
+    Returns a dict with one key per finished part and a 'pending' list of the
+    parts that missed the deadline. Pending lookups keep running in the
+    background; calling again for a pending part waits on the running lookup
+    instead of starting another, and gets its result even if it finished in
+    between (results that are not cached, such as remote timezones, are not
+    fetched twice).
+    """
+    futures = {}
+    keys = {}
+    with _enrich_inflight_lock:
+        expired = time.monotonic() - ENRICH_RESULT_TTL
+        for key, finished_at in list(_enrich_finished_at.items()):
+            if finished_at < expired:
+                del _enrich_finished_at[key]
+                _enrich_inflight.pop(key, None)
+
+    for part in parts:
+        if part not in ENRICH_PARTS:
+            raise ValueError(f"Unknown enrichment part: {part}")
+        key = (part, lat, lon, radius)
+        with _enrich_inflight_lock:
+            future = _enrich_inflight.get(key)
+            started = future is None
+            if started:
+                future = _enrich_inflight[key] = _enrich_executor.submit(ENRICH_PARTS[part], lat, lon, radius)
+        if started:
+            # Outside the lock: a lookup that already finished runs the callback here
+            future.add_done_callback(lambda done, key=key: _mark_enrich_finished(key, done))
+        futures[future] = part
+        keys[future] = key
+
+    done, not_done = wait(futures, timeout=timeout)
+
+    with _enrich_inflight_lock:
+        # Collected: the next call for these parts starts a fresh lookup
+        for future in done:
+            if _enrich_inflight.get(keys[future]) is future:
+                del _enrich_inflight[keys[future]]
+                _enrich_finished_at.pop(keys[future], None)
+
+    result = {'pending': sorted(futures[future] for future in not_done)}
+    for future in done:
+        try:
+            result[futures[future]] = future.result()
+        except Exception as e:
+            print(f"Error enriching location ({futures[future]}): {e}")
+            result[futures[future]] = None
+    return result
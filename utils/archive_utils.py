@@ -0,0 +1,125 @@
+import struct
+import zlib
+from typing import Dict, Optional
+
+import numpy as np
+
+ARCHIVE_FORMAT_VERSION = 1
+COORDINATE_SCALE = 1_000_000  # microdegrees, ~11 cm
+ACCURACY_SCALE = 100  # centimeters
+COMPRESSION_LEVEL = 9
+
+ARCHIVE_COLUMNS = ('id', 'latitude', 'longitude', 'timestamp_ms', 'accuracy')
+
+_HEADER = struct.Struct('<BI')  # format version, point count
+
+
+def _zigzag(values: np.ndarray) -> np.ndarray:
+    """Map signed ints to unsigned so small magnitudes stay small."""
+    return ((values << 1) ^ (values >> 63)).astype(np.uint64)
+
+
+def _unzigzag(values: np.ndarray) -> np.ndarray:
+    values = values.astype(np.int64)
+    return (values >> 1) ^ -(values & 1)
+
+
+def varint_encode(values: np.ndarray) -> bytes:
+    """Encode unsigned ints as LEB128 varints (7 bits per byte, vectorized)."""
+    values = np.asarray(values, dtype=np.uint64)
+    if len(values) == 0:
+        return b''
+
+    lengths = np.ones(len(values), dtype=np.int64)
+    rest = values >> np.uint64(7)
+    while rest.any():
+        lengths += rest > 0
+        rest >>= np.uint64(7)
+
+    owner = np.repeat(np.arange(len(values)), lengths)
+    position = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    chunks = (values[owner] >> (np.uint64(7) * position.astype(np.uint64))) & np.uint64(0x7f)
+    more = position < lengths[owner] - 1
+    return (chunks | (more.astype(np.uint64) << np.uint64(7))).astype(np.uint8).tobytes()
+
+
+def varint_decode(data: bytes) -> np.ndarray:
+    """Decode a run of LEB128 varints into a uint64 array."""
+    chunks = np.frombuffer(data, dtype=np.uint8)
+    if len(chunks) == 0:
+        return np.empty(0, dtype=np.uint64)
+    if chunks[-1] & 0x80:
+        raise ValueError("Truncated varint stream")
+
+    is_last = chunks < 0x80
+    starts = np.flatnonzero(np.concatenate(([True], is_last[:-1])))
+    group = np.cumsum(np.concatenate(([0], is_last[:-1])))
+    shift = (7 * (np.arange(len(chunks)) - starts[group])).astype(np.uint64)
+    return np.add.reduceat((chunks & 0x7f).astype(np.uint64) << shift, starts)
+
+
+def encode_track(
+    ids: np.ndarray,
+    lats: np.ndarray,
+    lons: np.ndarray,
+    timestamps_ms: np.ndarray,
+    accuracies: Optional[np.ndarray] = None
+) -> bytes:
+    """Pack a time-ordered track into a compressed columnar blob.
+
+    Coordinates are stored as fixed-point microdegrees and accuracy in
+    centimeters (NaN for missing). Every column is delta and zigzag encoded,
+    written as varints one column after another, and zlib-compressed.
+    """
+    count = len(ids)
+    if accuracies is None:
+        accuracies = np.full(count, np.nan)
+    accuracies = np.asarray(accuracies, dtype=float)
+
+    # 0 marks a missing accuracy; present values are shifted up by one
+    present = ~np.isnan(accuracies)
+    accuracy_codes = np.zeros(count, dtype=np.int64)
+    accuracy_codes[present] = _zigzag(
+        np.round(accuracies[present] * ACCURACY_SCALE).astype(np.int64)
+    ).astype(np.int64) + 1
+
+    columns = np.vstack((
+        np.asarray(ids, dtype=np.int64),
+        np.round(np.asarray(lats, dtype=float) * COORDINATE_SCALE).astype(np.int64),
+        np.round(np.asarray(lons, dtype=float) * COORDINATE_SCALE).astype(np.int64),
+        np.asarray(timestamps_ms, dtype=np.int64),
+        accuracy_codes
+    ))
+    deltas = np.diff(columns, axis=1, prepend=0)
+    payload = varint_encode(_zigzag(deltas.ravel()))
+    return _HEADER.pack(ARCHIVE_FORMAT_VERSION, count) + zlib.compress(payload, COMPRESSION_LEVEL)
+
+
+def decode_track(blob: bytes) -> Dict[str, np.ndarray]:
+    """Unpack a blob from encode_track() into column arrays.
+
+    Returns id, latitude, longitude, timestamp_ms and accuracy (NaN where
+    missing).
+    """
+    version, count = _HEADER.unpack_from(blob)
+    if version != ARCHIVE_FORMAT_VERSION:
+        raise ValueError(f"Unsupported archive format version {version}")
+
+    values = varint_decode(zlib.decompress(blob[_HEADER.size:]))
+    if len(values) != count * len(ARCHIVE_COLUMNS):
+        raise ValueError("Corrupt archive: unexpected number of values")
+
+    columns = np.cumsum(_unzigzag(values).reshape(len(ARCHIVE_COLUMNS), count), axis=1)
+    ids, lats, lons, timestamps_ms, accuracy_codes = columns
+
+    accuracies = np.full(count, np.nan)
+    present = accuracy_codes > 0
+    accuracies[present] = _unzigzag(accuracy_codes[present] - 1) / ACCURACY_SCALE
+
+    return {
+        'id': ids,
+        'latitude': lats / COORDINATE_SCALE,
+        'longitude': lons / COORDINATE_SCALE,
+        'timestamp_ms': timestamps_ms,
+        'accuracy': accuracies
+    }
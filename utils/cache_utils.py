@@ -0,0 +1,402 @@
+import os
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# On-disk cache shared by all geo lookups (override in .env)
+CACHE_DB_PATH = os.getenv("GEO_CACHE_DB_PATH", "geo_cache.db")
+# Geohash precision 7 is a ~150m x 150m cell, roughly one city block
+GEOHASH_PRECISION = int(os.getenv("GEO_CACHE_PRECISION", "7"))
+GEO_CACHE_TTL = int(os.getenv("GEO_CACHE_TTL", str(7 * 24 * 3600)))
+GEO_CACHE_MAX_ENTRIES = int(os.getenv("GEO_CACHE_MAX_ENTRIES", "50000"))
+
+_GEOHASH_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def geohash_encode(lat: float, lon: float, precision: int = GEOHASH_PRECISION) -> str:
+    """Encode coordinates as a geohash string of the given precision."""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+
+    while len(chars) < precision:
+        rng, value = (lon_range, lon) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            rng[0] = mid
+        else:
+            bits <<= 1
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+
+        if bit_count == 5:
+            chars.append(_GEOHASH_BASE32[bits])
+            bits = 0
+            bit_count = 0
+
+    return ''.join(chars)
+
+
+class GeoCache:
+    """Two-tier (memory + SQLite) cache keyed by a quantized coordinate cell."""
+
+    def __init__(
+        self,
+        namespace: str,
+        db_path: str = None,
+        precision: int = GEOHASH_PRECISION,
+        ttl: int = GEO_CACHE_TTL,
+        max_entries: int = GEO_CACHE_MAX_ENTRIES,
+        memory_entries: int = 1024
+    ):
+        self.namespace = namespace
+        self.db_path = db_path or CACHE_DB_PATH
+        self.precision = precision
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+
+        self._memory: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._disk_count = None
+        self.hits = 0
+        self.memory_hits = 0
+        self.misses = 0
+
+    def _get_conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS geo_cache (
+                    namespace TEXT NOT NULL,
+                    cell TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    PRIMARY KEY (namespace, cell)
+                )
+            ''')
+            self._conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_geo_cache_lru
+                ON geo_cache (namespace, accessed_at)
+            ''')
+            self._conn.commit()
+            self._disk_count = self._conn.execute(
+                'SELECT COUNT(*) FROM geo_cache WHERE namespace = ?',
+                (self.namespace,)
+            ).fetchone()[0]
+        return self._conn
+
+    def cell(self, lat: float, lon: float) -> str:
+        """Return the cache cell for a coordinate."""
+        return geohash_encode(lat, lon, self.precision)
+
+    def get(self, lat: float, lon: float) -> Tuple[bool, Any]:
+        """Look up a coordinate. Returns (found, value)."""
+        return self.get_key(self.cell(lat, lon))
+
+    def set(self, lat: float, lon: float, value: Any) -> None:
+        """Store a value for the cell containing the coordinate."""
+        self.set_key(self.cell(lat, lon), value)
+
+    def get_key(self, key: str) -> Tuple[bool, Any]:
+        """Look up a raw cache key. Returns (found, value)."""
+        found = self.get_many([key])
+        if key in found:
+            return True, found[key]
+        return False, None
+
+    def set_key(self, key: str, value: Any) -> None:
+        """Store a value under a raw cache key."""
+        self.set_many({key: value})
+
+    def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """Look up several raw keys with one disk query. Returns the fresh hits."""
+        now = time.time()
+        found: Dict[str, Any] = {}
+        with self._lock:
+            pending = []
+            for key in keys:
+                entry = self._memory.get(key)
+                if entry is not None:
+                    created_at, value = entry
+                    if now - created_at < self.ttl:
+                        self._memory.move_to_end(key)
+                        self.memory_hits += 1
+                        found[key] = value
+                        continue
+                    del self._memory[key]
+                pending.append(key)
+
+            if pending:
+                try:
+                    conn = self._get_conn()
+                    fresh = []
+                    for i in range(0, len(pending), 500):
+                        chunk = pending[i:i + 500]
+                        rows = conn.execute(f'''
+                            SELECT cell, value, created_at FROM geo_cache
+                            WHERE namespace = ? AND cell IN ({','.join('?' * len(chunk))})
+                        ''', (self.namespace, *chunk)).fetchall()
+                        for key, raw, created_at in rows:
+                            if now - created_at < self.ttl:
+                                value = json.loads(raw)
+                                self._remember(key, created_at, value)
+                                found[key] = value
+                                fresh.append((now, self.namespace, key))
+
+                    if fresh:
+                        conn.executemany(
+                            'UPDATE geo_cache SET accessed_at = ? WHERE namespace = ? AND cell = ?',
+                            fresh
+                        )
+                        conn.commit()
+                except sqlite3.Error as e:
+                    print(f"Geo cache read error: {e}")
+
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def set_many(self, items: Dict[str, Any]) -> None:
+        """Store several raw keys in one transaction."""
+        now = time.time()
+        with self._lock:
+            for key, value in items.items():
+                self._remember(key, now, value)
+            try:
+                conn = self._get_conn()
+                cursor = conn.executemany('''
+                    INSERT OR REPLACE INTO geo_cache (namespace, cell, value, created_at, accessed_at)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', [
+                    (self.namespace, key, json.dumps(value), now, now)
+                    for key, value in items.items()
+                ])
+                self._disk_count += cursor.rowcount
+                if self._disk_count > self.max_entries:
+                    self._evict(conn, now)
+                conn.commit()
+            except sqlite3.Error as e:
+                print(f"Geo cache write error: {e}")
+
+    def _remember(self, key: str, created_at: float, value: Any) -> None:
+        self._memory[key] = (created_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        """Drop expired entries, then least recently used ones down to 90% capacity."""
+        conn.execute(
+            'DELETE FROM geo_cache WHERE namespace = ? AND created_at < ?',
+            (self.namespace, now - self.ttl)
+        )
+        count = conn.execute(
+            'SELECT COUNT(*) FROM geo_cache WHERE namespace = ?',
+            (self.namespace,)
+        ).fetchone()[0]
+        excess = count - int(self.max_entries * 0.9)
+        if excess > 0:
+            conn.execute('''
+                DELETE FROM geo_cache WHERE namespace = ? AND cell IN (
+                    SELECT cell FROM geo_cache WHERE namespace = ?
+                    ORDER BY accessed_at ASC LIMIT ?
+                )
+            ''', (self.namespace, self.namespace, excess))
+            count -= excess
+        self._disk_count = count
+
+    def clear(self) -> None:
+        """Remove every entry in this namespace."""
+        with self._lock:
+            self._memory.clear()
+            try:
+                conn = self._get_conn()
+                conn.execute('DELETE FROM geo_cache WHERE namespace = ?', (self.namespace,))
+                conn.commit()
+                self._disk_count = 0
+            except sqlite3.Error as e:
+                print(f"Geo cache clear error: {e}")
+
+    def stats(self) -> Dict:
+        """Return hit/miss counters for this cache."""
+        lookups = self.hits + self.misses
+        return {
+            'namespace': self.namespace,
+            'hits': self.hits,
+            'memory_hits': self.memory_hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'memory_entries': len(self._memory),
+            'disk_entries': self._disk_count
+        }
+
+    def cached(self, func: Callable) -> Callable:
+        """Decorate a func(lat, lon) lookup; None results are not cached."""
+        @wraps(func)
+        def wrapper(lat: float, lon: float, *args, **kwargs):
+            found, value = self.get(lat, lon)
+            if found:
+                return value
+            value = func(lat, lon, *args, **kwargs)
+            if value is not None:
+                self.set(lat, lon, value)
+            return value
+
+        wrapper.cache = self
+        return wrapper
+
+
+# Stale-while-revalidate defaults for remote query results
+SWR_TTL = 30  # seconds a value is served without refreshing
+SWR_MAX_STALE = 600  # older values are reloaded before being served
+
+
+class SWRCache:
+    """Process-wide in-memory cache of loader(*key) results with stale-while-revalidate.
+
+    Fresh values are returned as is. Values past `ttl` are still returned
+    immediately while one background thread per key reloads them; only
+    missing values, or values older than `max_stale`, make the caller wait.
+    A failed reload keeps serving the last good value.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[..., Any],
+        ttl: float = SWR_TTL,
+        max_stale: float = SWR_MAX_STALE,
+        max_entries: int = 256
+    ):
+        self.loader = loader
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.max_entries = max_entries
+
+        # key -> (loaded_at, stale, value)
+        self._entries: "OrderedDict[Tuple, Tuple[float, bool, Any]]" = OrderedDict()
+        self._loading: Dict[Tuple, threading.Event] = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.last_error: Optional[str] = None
+
+    def _load(self, key: Tuple) -> Any:
+        """Run the loader for a key and store its result (the caller owns the in-flight slot)."""
+        with self._lock:
+            generation = self._generation
+        try:
+            value = self.loader(*key)
+            with self._lock:
+                # Invalidated while loading: keep the value but reload it on next read
+                self._entries[key] = (time.monotonic(), generation != self._generation, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            return value
+        except Exception as e:
+            self.last_error = str(e)
+            raise
+        finally:
+            with self._lock:
+                self._loading.pop(key).set()
+
+    def _refresh(self, key: Tuple) -> None:
+        try:
+            self._load(key)
+        except Exception as e:
+            print(f"Error refreshing cached value for {key}: {e}")
+
+    def _start_refresh(self, key: Tuple) -> None:
+        """Reload a key in the background unless a load is already running (lock held)."""
+        if key not in self._loading:
+            self._loading[key] = threading.Event()
+            self.refreshes += 1
+            threading.Thread(target=self._refresh, args=(key,), daemon=True).start()
+
+    def get(self, *key) -> Any:
+        """Return the cached value for `key`, loading or refreshing it as needed."""
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    loaded_at, stale, value = entry
+                    age = time.monotonic() - loaded_at
+                    if not stale and age < self.ttl:
+                        self._entries.move_to_end(key)
+                        self.hits += 1
+                        return value
+                    if age < self.max_stale:
+                        self._start_refresh(key)
+                        self.stale_hits += 1
+                        return value
+                loading = self._loading.get(key)
+                if loading is None:
+                    self._loading[key] = threading.Event()
+                    self.misses += 1
+                    break
+            # Another caller is loading this key; share its result
+            loading.wait()
+            with self._lock:
+                entry = self._entries.get(key)
+            if entry is not None:
+                return entry[2]
+        return self._load(key)
+
+    def prefetch(self, *keys: Tuple) -> None:
+        """Load missing keys in the background."""
+        with self._lock:
+            for key in keys:
+                if key not in self._entries:
+                    self._start_refresh(key)
+
+    def invalidate(self, *key) -> None:
+        """Mark one key (or every key) stale; it is still served while it reloads."""
+        with self._lock:
+            self._generation += 1
+            keys = [key] if key else list(self._entries)
+            for k in keys:
+                if k in self._entries:
+                    loaded_at, _, value = self._entries[k]
+                    self._entries[k] = (loaded_at, True, value)
+
+    def stats(self) -> Dict:
+        """Return hit/miss counters for this cache."""
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'refreshes': self.refreshes,
+                'hit_rate': (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+                'entries': len(self._entries),
+                'last_error': self.last_error
+            }
+
+
+_swr_caches: Dict[str, SWRCache] = {}
+_swr_caches_lock = threading.Lock()
+
+
+def get_swr_cache(name: str, loader: Callable[..., Any], ttl: float = SWR_TTL) -> SWRCache:
+    """Return the process-wide stale-while-revalidate cache registered under `name`."""
+    with _swr_caches_lock:
+        cache = _swr_caches.get(name)
+        if cache is None:
+            cache = _swr_caches[name] = SWRCache(loader, ttl)
+        return cache
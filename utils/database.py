@@ -1,15 +1,433 @@
-import streamlit as st
-from supabase import create_client, Client
+import sqlite3
+import threading
+import time
+import weakref
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional
+
+from utils.spool_utils import RejectedBatchError
+
+# Seconds between health checks of an idle handle
+HEALTH_CHECK_INTERVAL = 30
+SUPABASE_HEALTH_CHECK_INTERVAL = 300  # a remote round trip, so less often
+# Reconnect backoff after a failed connect or health check (seconds)
+RECONNECT_BACKOFF_BASE = 1.0
+RECONNECT_BACKOFF_MAX = 60.0
+STATEMENT_CACHE_SIZE = 256
+# Idle SQLite connections kept per database for the next thread
+SQLITE_POOL_SIZE = 8
+
+if TYPE_CHECKING:
+    from supabase import Client
+
+
+class ConnectionRegistry:
+    """Process-wide registry of database handles, created lazily and reused.
+
+    Each registered name has a factory that opens a handle and an optional
+    health check. Shared handles (e.g. the Supabase client) are created once
+    per process. Thread-local ones (SQLite connections) are checked out of a
+    small per-name pool by a thread on its first get() and returned when the
+    thread ends, so short-lived threads (one per Streamlit script run) reuse
+    connections instead of opening their own. A handle whose health check
+    fails is replaced, and failed connects are
+    retried with exponential backoff instead of on every call. Checks that
+    cost a network round trip can run in the background, so get() never
+    waits on them.
+    """
+
+    def __init__(self):
+        self._factories: Dict[str, tuple] = {}
+        self._shared: Dict[str, list] = {}  # name -> [handle, checked_at]
+        self._local = threading.local()
+        self._pools: Dict[str, List[list]] = {}  # name -> idle thread-local slots
+        self._stats: Dict[str, Dict] = {}
+        self._locks: Dict[str, threading.RLock] = {}
+        self._pool_sizes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def register(
+        self,
+        name: str,
+        factory: Callable[[], Any],
+        health_check: Optional[Callable[[Any], None]] = None,
+        thread_local: bool = False,
+        check_interval: float = HEALTH_CHECK_INTERVAL,
+        check_in_background: bool = False,
+        pool_size: int = SQLITE_POOL_SIZE
+    ) -> None:
+        """Register how to open a handle (no-op if `name` is already registered).
+
+        Thread-local handles must be usable from any thread, one at a time;
+        at most `pool_size` idle ones are kept open.
+        """
+        if self.is_registered(name):
+            return
+        with self._lock:
+            if name not in self._factories:
+                self._factories[name] = (factory, health_check, thread_local, check_interval, check_in_background)
+                self._pools[name] = []
+                self._pool_sizes[name] = pool_size
+                # Reentrant: a thread's handles may be returned by a finalizer
+                # that runs while this thread holds the lock
+                self._locks[name] = threading.RLock()
+                self._stats[name] = {
+                    'created': 0,
+                    'reused': 0,
+                    'health_checks': 0,
+                    'reconnects': 0,
+                    'failures': 0,
+                    'consecutive_failures': 0,
+                    'open': 0,
+                    'checkouts': 0,
+                    'last_error': None,
+                    'retry_at': 0.0
+                }
+
+    def is_registered(self, name: str) -> bool:
+        return name in self._factories
+
+    def _slots(self, thread_local: bool) -> Dict[str, list]:
+        if not thread_local:
+            return self._shared
+        owner = getattr(self._local, 'owner', None)
+        if owner is None:
+            owner = self._local.owner = _ThreadHandles()
+            # Runs when the thread ends and its thread-local data is freed
+            weakref.finalize(owner, self._release, owner.slots)
+        return owner.slots
+
+    def _release(self, slots: Dict[str, list]) -> None:
+        """Return a finished thread's handles to their pools (closing any surplus)."""
+        for name in list(slots):
+            with self._locks[name]:
+                slot = slots.pop(name)
+                pool = self._pools[name]
+                try:
+                    if getattr(slot[0], 'in_transaction', False):
+                        slot[0].rollback()
+                except Exception as e:
+                    print(f"Dropping {name} handle left in a transaction: {e}")
+                    pool = None
+                if pool is not None and len(pool) < self._pool_sizes[name]:
+                    pool.append(slot)
+                else:
+                    self._close(name, slot[0])
+
+    def _fail(self, stats: Dict, error: Exception) -> None:
+        stats['failures'] += 1
+        stats['consecutive_failures'] += 1
+        stats['last_error'] = str(error)
+        delay = min(RECONNECT_BACKOFF_BASE * 2 ** (stats['consecutive_failures'] - 1), RECONNECT_BACKOFF_MAX)
+        stats['retry_at'] = time.monotonic() + delay
+
+    def get(self, name: str) -> Any:
+        """Return the handle for `name`, opening or replacing it as needed.
+
+        Raises ConnectionError while reconnecting is backing off.
+        """
+        factory, health_check, thread_local, check_interval, check_in_background = self._factories[name]
+        stats = self._stats[name]
+        slots = self._slots(thread_local)
+        now = time.monotonic()
+
+        with self._locks[name]:
+            slot = slots.get(name)
+            if slot is None and thread_local and self._pools[name]:
+                slot = slots[name] = self._pools[name].pop()
+                stats['checkouts'] += 1
+            if slot is not None:
+                if health_check is None or now - slot[1] < check_interval:
+                    stats['reused'] += 1
+                    return slot[0]
+                if check_in_background:
+                    # Serve the current handle; a failed check drops it for the next call
+                    slot[1] = now
+                    threading.Thread(
+                        target=self._check_in_background, args=(name, slot), daemon=True
+                    ).start()
+                    stats['reused'] += 1
+                    return slot[0]
+                stats['health_checks'] += 1
+                try:
+                    health_check(slot[0])
+                    slot[1] = now
+                    stats['reused'] += 1
+                    return slot[0]
+                except Exception as e:
+                    print(f"Health check failed for {name}, reconnecting: {e}")
+                    self._discard(name, slots)
+                    stats['reconnects'] += 1
+
+            if now < stats['retry_at']:
+                raise ConnectionError(f"{name} unavailable, retrying later: {stats['last_error']}")
+            try:
+                handle = factory()
+            except Exception as e:
+                self._fail(stats, e)
+                raise
+            stats['consecutive_failures'] = 0
+            stats['created'] += 1
+            stats['open'] += 1
+            if thread_local:
+                stats['checkouts'] += 1
+            slots[name] = [handle, now]
+            return handle
+
+    def _check_in_background(self, name: str, slot: list) -> None:
+        stats = self._stats[name]
+        stats['health_checks'] += 1
+        try:
+            self._factories[name][1](slot[0])
+        except Exception as e:
+            print(f"Health check failed for {name}, reconnecting: {e}")
+            with self._locks[name]:
+                if self._shared.get(name) is slot:
+                    self._discard(name, self._shared)
+                    stats['reconnects'] += 1
+
+    def _discard(self, name: str, slots: Dict[str, list]) -> None:
+        self._close(name, slots.pop(name)[0])
+
+    def _close(self, name: str, handle: Any) -> None:
+        self._stats[name]['open'] -= 1
+        close = getattr(handle, 'close', None)
+        if close is not None:
+            try:
+                close()
+            except Exception:
+                pass
+
+    def report_failure(self, name: str, error: Exception) -> None:
+        """Drop a handle a caller found broken; the next get() reconnects."""
+        slots = self._slots(self._factories[name][2])
+        with self._locks[name]:
+            if name in slots:
+                self._discard(name, slots)
+                self._stats[name]['reconnects'] += 1
+            self._stats[name]['last_error'] = str(error)
+
+    def close(self, name: str = None) -> None:
+        """Close this thread's thread-local handles and the idle pooled ones
+        (for `name`, or all of them)."""
+        owner = getattr(self._local, 'owner', None)
+        slots = owner.slots if owner is not None else {}
+        for key in [name] if name else list(self._pools):
+            if key not in self._pools:
+                continue
+            with self._locks[key]:
+                if key in slots:
+                    self._discard(key, slots)
+                while self._pools[key]:
+                    self._close(key, self._pools[key].pop()[0])
+
+    def metrics(self) -> Dict[str, Dict]:
+        """Return per-handle creation, reuse, health-check and failure counters.
+
+        `open` counts live handles, including `idle` pooled ones.
+        """
+        with self._lock:
+            metrics = {}
+            for name, stats in self._stats.items():
+                calls = stats['created'] + stats['reused']
+                metrics[name] = {
+                    **{key: value for key, value in stats.items() if key != 'retry_at'},
+                    'idle': len(self._pools.get(name, ())),
+                    'reuse_rate': stats['reused'] / calls if calls else 0.0
+                }
+            return metrics
+
+
+class _ThreadHandles:
+    """A thread's checked-out handles; freed, and so returned, when the thread ends."""
+
+    def __init__(self):
+        self.slots: Dict[str, list] = {}
+
+
+_registry: Optional[ConnectionRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> ConnectionRegistry:
+    """Return the process-wide connection registry."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ConnectionRegistry()
+    return _registry
+
+
+def _sqlite_health_check(conn: sqlite3.Connection) -> None:
+    conn.execute("SELECT 1").fetchone()
+
+
+def get_sqlite_connection(path: str, setup: Callable[[sqlite3.Connection], None] = None) -> sqlite3.Connection:
+    """Return this thread's autocommit connection to a SQLite file.
+
+    The connection is taken from a process-wide pool on the thread's first
+    call and returned when the thread ends, so it is opened once and then
+    reused by later threads. `setup` runs once on each new connection
+    (pragmas, migrations).
+    """
+    name = f"sqlite:{path}"
+    registry = get_registry()
+    if not registry.is_registered(name):
+        def connect() -> sqlite3.Connection:
+            # Pooled connections move between threads, one thread at a time
+            conn = sqlite3.connect(
+                path, isolation_level=None, cached_statements=STATEMENT_CACHE_SIZE,
+                check_same_thread=False
+            )
+            if setup is not None:
+                setup(conn)
+            return conn
+
+        registry.register(name, connect, _sqlite_health_check, thread_local=True)
+    return registry.get(name)
+
+
+def _connect_supabase() -> "Client":
+    import streamlit as st
+    from supabase import create_client
+
+    url = st.secrets["supabase"]["url"]
+    key = st.secrets["supabase"]["key"]
+    return create_client(url, key)
+
+
+def _supabase_health_check(client: "Client") -> None:
+    client.table('flag_leaderboard').select('id').limit(1).execute()
+
+
+def get_supabase() -> "Client":
+    """Return the process-wide Supabase client, created on first use.
+
+    Its health check is a remote query, so it runs in the background.
+    """
+    registry = get_registry()
+    registry.register(
+        'supabase', _connect_supabase, _supabase_health_check,
+        check_interval=SUPABASE_HEALTH_CHECK_INTERVAL,
+        check_in_background=True
+    )
+    return registry.get('supabase')
+
+
+# DDL adding flag_leaderboard.idempotency_key and its unique index
+FLAG_LEADERBOARD_MIGRATION = "supabase/migrations/20261018000000_flag_leaderboard_idempotency_key.sql"
+
+# PostgreSQL error classes meaning the server refused the data itself
+_REJECTED_SQLSTATE_CLASSES = ('22', '23', '42')
+
+
+def is_rejected_request(error: Exception) -> bool:
+    """Whether a Supabase error is the server refusing the request (4xx-like),
+    as opposed to the server being unreachable or failing."""
+    from postgrest.exceptions import APIError
+
+    if not isinstance(error, APIError):
+        return False
+    code = error.code
+    if isinstance(code, int):  # non-JSON error body: the HTTP status
+        return 400 <= code < 500 and code not in (408, 429)
+    code = str(code or '')
+    return code.startswith('PGRST') or code[:2] in _REJECTED_SQLSTATE_CLASSES
+
 
 class FlagGameDatabase:
+    """Flag Guesser access to the shared Supabase client.
+
+    Cheap to build: the client is created once per process by the registry
+    and `supabase` is None while it is unavailable.
+    """
+
     def __init__(self):
-        self.setup_supabase_connection()
-    
-    def setup_supabase_connection(self):
+        # Whether flag_leaderboard has idempotency_key (None until checked)
+        self.has_idempotency_key: Optional[bool] = None
+        # False once an upsert on idempotency_key failed for lack of a unique index
+        self.idempotent_writes = True
+        # Why score writes are not idempotent, for the spool panel
+        self.schema_error: Optional[str] = None
+
+    def check_idempotency_key(self) -> bool:
+        """Return whether flag_leaderboard has the idempotency_key column (checked once)."""
+        if self.has_idempotency_key is None:
+            from postgrest.exceptions import APIError
+
+            supabase = self.supabase
+            if supabase is None:
+                raise ConnectionError("Database connection unavailable")
+            try:
+                supabase.table('flag_leaderboard').select('idempotency_key').limit(1).execute()
+                self.has_idempotency_key = True
+            except APIError as e:
+                if not is_rejected_request(e):
+                    raise
+                self.has_idempotency_key = False
+                self.schema_error = (
+                    f"flag_leaderboard has no idempotency_key column ({e.message}); "
+                    f"apply {FLAG_LEADERBOARD_MIGRATION}. Scores are inserted without "
+                    "deduplication until then, so a retried batch may be stored twice."
+                )
+                print(self.schema_error)
+        return self.has_idempotency_key
+
+    def insert_scores(self, rows: List[Dict]) -> None:
+        """Write a batch of flag_leaderboard rows (the score spool's sender).
+
+        Upserts on idempotency_key so a retried batch is not stored twice.
+        Without the column or its unique index, rows are inserted plainly and
+        schema_error says why. Raises RejectedBatchError when the server
+        refuses the rows.
+        """
+        from postgrest.exceptions import APIError
+
+        supabase = self.supabase
+        if supabase is None:
+            raise ConnectionError("Database connection unavailable")
+        try:
+            if self.check_idempotency_key() and self.idempotent_writes:
+                try:
+                    supabase.table('flag_leaderboard')\
+                        .upsert(rows, on_conflict='idempotency_key', ignore_duplicates=True)\
+                        .execute()
+                    return
+                except APIError as e:
+                    if e.code != '42P10':  # no unique index to conflict on
+                        raise
+                    self.idempotent_writes = False
+                    self.schema_error = (
+                        f"flag_leaderboard.idempotency_key has no unique index; apply "
+                        f"{FLAG_LEADERBOARD_MIGRATION}. Scores are inserted without "
+                        "deduplication until then."
+                    )
+                    print(self.schema_error)
+            if not self.has_idempotency_key:
+                rows = [{k: v for k, v in row.items() if k != 'idempotency_key'} for row in rows]
+            supabase.table('flag_leaderboard').insert(rows).execute()
+        except Exception as e:
+            if is_rejected_request(e):
+                raise RejectedBatchError(str(e)) from e
+            raise
+
+    @property
+    def supabase(self) -> Optional["Client"]:
         try:
-            url = st.secrets["supabase"]["url"]
-            key = st.secrets["supabase"]["key"]
-            self.supabase: Client = create_client(url, key)
+            return get_supabase()
+        except ConnectionError:
+            return None  # backing off after a reported failure
         except Exception as e:
-            st.error(f"Failed to connect to database: {e}")
-            self.supabase = None 
\ No newline at end of file
+            print(f"Failed to connect to database: {e}")
+            return None
+
+
+_flag_database: Optional[FlagGameDatabase] = None
+
+
+def get_flag_database() -> FlagGameDatabase:
+    """Return the process-wide FlagGameDatabase."""
+    global _flag_database
+    if _flag_database is None:
+        _flag_database = FlagGameDatabase()
+    return _flag_database
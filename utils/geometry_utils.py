@@ -0,0 +1,129 @@
+import math
+
+import numpy as np
+
+# Web Mercator ground resolution at zoom 0 on the equator (meters per pixel)
+METERS_PER_PIXEL_Z0 = 156543.03392
+EARTH_RADIUS_M = 6371008.8
+
+
+def decode_polyline(encoded: str, precision: int = 5) -> np.ndarray:
+    """Decode an encoded polyline (as returned by OSRM) into an (n, 2) lat/lon array.
+
+    The decoding is vectorized: characters are split into varint chunks,
+    chunks are summed per value with np.add.reduceat, and coordinates are
+    rebuilt with a cumulative sum of the zigzag-decoded deltas.
+    """
+    if not encoded:
+        return np.empty((0, 2))
+
+    chunks = np.frombuffer(encoded.encode('ascii'), dtype=np.uint8).astype(np.int64) - 63
+    is_last = chunks < 0x20
+    starts = np.flatnonzero(np.concatenate(([True], is_last[:-1])))
+    group = np.cumsum(np.concatenate(([0], is_last[:-1])))
+    shift = 5 * (np.arange(len(chunks)) - starts[group])
+
+    values = np.add.reduceat((chunks & 0x1f) << shift, starts)
+    deltas = np.where(values & 1, ~(values >> 1), values >> 1)
+    if len(deltas) % 2:
+        raise ValueError("Malformed polyline: odd number of values")
+
+    return np.cumsum(deltas.reshape(-1, 2), axis=0) / 10 ** precision
+
+
+def encode_polyline(coords: np.ndarray, precision: int = 5) -> str:
+    """Encode an (n, 2) lat/lon array as a polyline string."""
+    coords = np.asarray(coords, dtype=float)
+    if len(coords) == 0:
+        return ''
+
+    scaled = np.round(coords * 10 ** precision).astype(np.int64)
+    deltas = np.diff(scaled, axis=0, prepend=[[0, 0]]).ravel()
+    values = np.where(deltas < 0, ~(deltas << 1), deltas << 1)
+
+    result = []
+    for value in values.tolist():
+        while value >= 0x20:
+            result.append(chr((0x20 | (value & 0x1f)) + 63))
+            value >>= 5
+        result.append(chr(value + 63))
+    return ''.join(result)
+
+
+def tolerance_for_zoom(zoom: float, lat: float = 0.0, pixels: float = 1.0) -> float:
+    """Return the ground distance in meters covered by `pixels` at a map zoom level."""
+    return pixels * METERS_PER_PIXEL_Z0 * math.cos(math.radians(lat)) / (2 ** zoom)
+
+
+def _project(coords: np.ndarray) -> np.ndarray:
+    """Project lat/lon to local equirectangular meters around the mean latitude."""
+    lat0 = math.radians(float(np.mean(coords[:, 0])))
+    y = np.radians(coords[:, 0]) * EARTH_RADIUS_M
+    x = np.radians(coords[:, 1]) * EARTH_RADIUS_M * math.cos(lat0)
+    return np.column_stack((x, y))
+
+
+def simplify_mask(coords: np.ndarray, tolerance: float) -> np.ndarray:
+    """Return a boolean mask of the vertices kept by Douglas-Peucker.
+
+    `tolerance` is in meters. All open segments are split in the same pass:
+    every undecided vertex is measured against its enclosing segment at once,
+    so the number of passes is the depth of the split tree, not the number
+    of splits.
+    """
+    n = len(coords)
+    keep = np.zeros(n, dtype=bool)
+    if n == 0:
+        return keep
+    if n < 3 or tolerance <= 0:
+        keep[:] = True
+        return keep
+
+    points = _project(np.asarray(coords, dtype=float))
+    keep[0] = keep[-1] = True
+    pending = ~keep
+
+    while pending.any():
+        candidates = np.flatnonzero(pending)
+        kept = np.flatnonzero(keep)
+        segment = np.searchsorted(kept, candidates) - 1
+        start = points[kept[segment]]
+        direction = points[kept[segment + 1]] - start
+        offset = points[candidates] - start
+
+        length = np.hypot(direction[:, 0], direction[:, 1])
+        cross = np.abs(offset[:, 0] * direction[:, 1] - offset[:, 1] * direction[:, 0])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            distances = np.where(length > 0, cross / length, np.hypot(offset[:, 0], offset[:, 1]))
+
+        # Farthest vertex per segment (candidates are sorted, so segments are contiguous)
+        group_starts = np.flatnonzero(np.concatenate(([True], segment[1:] != segment[:-1])))
+        group_sizes = np.diff(np.append(group_starts, len(candidates)))
+        group_max = np.maximum.reduceat(distances, group_starts)
+        is_max = distances == np.repeat(group_max, group_sizes)
+        group = np.repeat(np.arange(len(group_starts)), group_sizes)
+        max_positions = np.flatnonzero(is_max)
+        _, first_max = np.unique(group[max_positions], return_index=True)
+        farthest = candidates[max_positions[first_max]]
+
+        split = group_max > tolerance
+        keep[farthest[split]] = True
+        pending[farthest[split]] = False
+        pending[candidates[~np.repeat(split, group_sizes)]] = False
+
+    return keep
+
+
+def simplify_line(coords: np.ndarray, tolerance: float) -> np.ndarray:
+    """Simplify an (n, 2) lat/lon array with Douglas-Peucker (tolerance in meters)."""
+    coords = np.asarray(coords, dtype=float)
+    return coords[simplify_mask(coords, tolerance)]
+
+
+def simplify_for_zoom(coords: np.ndarray, zoom: float, pixels: float = 1.0) -> np.ndarray:
+    """Simplify a line so no vertex is dropped that would move it by more than `pixels` at `zoom`."""
+    coords = np.asarray(coords, dtype=float)
+    if len(coords) < 3:
+        return coords
+    lat = float(np.mean(coords[:, 0]))
+    return simplify_line(coords, tolerance_for_zoom(zoom, lat, pixels))
@@ -0,0 +1,253 @@
+import codecs
+import json
+import random
+import re
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# (connect, read) timeouts in seconds per upstream provider
+PROVIDER_TIMEOUTS: Dict[str, Tuple[float, float]] = {
+    'nominatim': (3.05, 10),
+    'overpass': (3.05, 30),
+    'osrm': (3.05, 10),
+    'geoapify': (3.05, 8),
+    'timezonedb': (3.05, 5),
+    'photon': (3.05, 8),
+    'default': (3.05, 10)
+}
+
+MAX_RETRIES = 2
+BACKOFF_BASE = 0.3  # seconds, doubled on every attempt
+BACKOFF_MAX = 5.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+POOL_CONNECTIONS = 10  # number of hosts to keep pools for
+POOL_MAXSIZE = 20  # keep-alive connections per host
+
+USER_AGENT = "location_services_app"
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+_metrics: Dict[str, Dict] = {}
+_metrics_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """Return the process-wide HTTP session with pooled keep-alive connections."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=POOL_CONNECTIONS,
+                    pool_maxsize=POOL_MAXSIZE,
+                    max_retries=0
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers.update({'User-Agent': USER_AGENT})
+                _session = session
+    return _session
+
+
+def get_timeout(provider: str) -> Tuple[float, float]:
+    """Return the (connect, read) timeout for a provider."""
+    return PROVIDER_TIMEOUTS.get(provider, PROVIDER_TIMEOUTS['default'])
+
+
+def _backoff(attempt: int, response: Optional[requests.Response] = None) -> float:
+    """Jittered exponential backoff, honouring Retry-After when present."""
+    if response is not None:
+        retry_after = response.headers.get('Retry-After')
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), BACKOFF_MAX)
+    delay = min(BACKOFF_BASE * (2 ** attempt), BACKOFF_MAX)
+    return delay * random.uniform(0.5, 1.5)
+
+
+def _provider_stats(provider: str) -> Dict:
+    stats = _metrics.get(provider)
+    if stats is None:
+        stats = _metrics[provider] = {
+            'requests': 0,
+            'errors': 0,
+            'retries': 0,
+            'bytes': 0,
+            'total_latency': 0.0,
+            'max_latency': 0.0,
+            'recent': deque(maxlen=500)
+        }
+    return stats
+
+
+def record_bytes(provider: str, count: int) -> None:
+    """Add received response bytes to a provider's metrics."""
+    with _metrics_lock:
+        _provider_stats(provider)['bytes'] += count
+
+
+def _record(provider: str, latency: float, ok: bool, retries: int) -> None:
+    with _metrics_lock:
+        stats = _provider_stats(provider)
+        stats['requests'] += 1
+        stats['retries'] += retries
+        stats['total_latency'] += latency
+        stats['max_latency'] = max(stats['max_latency'], latency)
+        stats['recent'].append(latency)
+        if not ok:
+            stats['errors'] += 1
+
+
+def http_request(
+    method: str,
+    provider: str,
+    url: str,
+    max_retries: int = MAX_RETRIES,
+    **kwargs
+) -> requests.Response:
+    """Send a request through the shared session with timeouts and retries.
+
+    Connection errors, timeouts and retryable status codes are retried with
+    jittered backoff. The last exception is re-raised when all attempts fail.
+    """
+    kwargs.setdefault('timeout', get_timeout(provider))
+    session = get_session()
+    start = time.perf_counter()
+    attempt = 0
+
+    while True:
+        try:
+            response = session.request(method, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt >= max_retries:
+                _record(provider, time.perf_counter() - start, False, attempt)
+                raise
+            time.sleep(_backoff(attempt))
+            attempt += 1
+            continue
+
+        if response.status_code in RETRY_STATUSES and attempt < max_retries:
+            delay = _backoff(attempt, response)
+            response.close()
+            time.sleep(delay)
+            attempt += 1
+            continue
+
+        _record(provider, time.perf_counter() - start, response.ok, attempt)
+        if not kwargs.get('stream'):
+            record_bytes(provider, len(response.content))
+        return response
+
+
+def http_get(provider: str, url: str, params: Optional[Dict] = None, **kwargs) -> requests.Response:
+    """GET a URL through the shared session."""
+    return http_request('GET', provider, url, params=params, **kwargs)
+
+
+def http_post(provider: str, url: str, data=None, **kwargs) -> requests.Response:
+    """POST to a URL through the shared session."""
+    return http_request('POST', provider, url, data=data, **kwargs)
+
+
+def get_http_metrics() -> Dict[str, Dict]:
+    """Return request counts and latency percentiles per provider."""
+    with _metrics_lock:
+        result = {}
+        for provider, stats in _metrics.items():
+            recent = sorted(stats['recent'])
+            result[provider] = {
+                'requests': stats['requests'],
+                'errors': stats['errors'],
+                'retries': stats['retries'],
+                'bytes': stats['bytes'],
+                'avg_latency': stats['total_latency'] / stats['requests'] if stats['requests'] else 0.0,
+                'max_latency': stats['max_latency'],
+                'p50_latency': recent[len(recent) // 2] if recent else 0.0,
+                'p95_latency': recent[int(len(recent) * 0.95)] if recent else 0.0
+            }
+        return result
+
+
+def _read_remark(text: str, meta: Dict[str, Any]) -> None:
+    match = re.search(r'"remark"\s*:\s*("(?:[^"\\]|\\.)*")', text)
+    if match:
+        meta['remark'] = json.loads(match.group(1))
+
+
+def iter_json_array(
+    response: requests.Response,
+    key: str,
+    provider: Optional[str] = None,
+    chunk_size: int = 64 * 1024,
+    meta: Optional[Dict[str, Any]] = None
+) -> Iterator[Any]:
+    """Yield the items of a top-level JSON array from a streamed response.
+
+    Only the current chunk and the item being decoded are held in memory, so
+    large payloads parse in constant space. The array's items must be objects
+    or arrays (as in Overpass "elements"). Raises ValueError if the body ends
+    before the array is closed. If `meta` is given, a top-level "remark"
+    (Overpass reports timeouts and partial results this way) is stored in it.
+    """
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder(response.encoding or 'utf-8')(errors='replace')
+    start = re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
+    buffer = ''
+    pos = 0
+    in_array = False
+    received = 0
+    # Top-level text outside the array, searched for "remark" at the end
+    outside = ''
+
+    try:
+        chunks = response.iter_content(chunk_size=chunk_size)
+        for chunk in chunks:
+            received += len(chunk)
+            buffer = buffer[pos:] + text.decode(chunk)
+            pos = 0
+
+            if not in_array:
+                match = start.search(buffer)
+                if match is None:
+                    # Keep a tail in case the key is split across chunks
+                    pos = max(0, len(buffer) - len(key) - 16)
+                    outside += buffer[:pos]
+                    continue
+                in_array = True
+                outside += buffer[:match.start()]
+                pos = match.end()
+
+            while True:
+                while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                    pos += 1
+                if pos >= len(buffer):
+                    break
+                if buffer[pos] == ']':
+                    if meta is not None:
+                        # The rest of the body is the small trailer after the array
+                        outside += buffer[pos + 1:]
+                        for chunk in chunks:
+                            received += len(chunk)
+                            outside += text.decode(chunk)
+                        _read_remark(outside, meta)
+                    return
+                try:
+                    item, pos = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    break  # item continues in the next chunk
+                yield item
+
+        if in_array:
+            raise ValueError(f"Response ended inside the '{key}' array")
+        raise ValueError(f"Response has no '{key}' array")
+    finally:
+        if provider:
+            record_bytes(provider, received)
+        response.close()
@@ -0,0 +1,246 @@
+import atexit
+import os
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+from utils import location_utils
+
+# Bounded so a stalled disk applies backpressure instead of growing memory
+WRITE_BEHIND_QUEUE_SIZE = int(os.getenv("WRITE_BEHIND_QUEUE_SIZE", "10000"))
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "500"))
+WRITE_BEHIND_FLUSH_INTERVAL = float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL", "0.5"))  # seconds
+
+_FLUSH = object()
+_STOP = object()
+
+
+class WriteBehindQueue:
+    """Buffers location points in memory and writes them in batches on a background thread.
+
+    A batch is written when it reaches batch_size points or flush_interval
+    seconds after its first point, whichever comes first. Points of the same
+    session are committed together through `write_batch`
+    (location_utils.add_location_points by default).
+    """
+
+    def __init__(
+        self,
+        write_batch: Callable[[str, List], List[bool]] = None,
+        maxsize: int = WRITE_BEHIND_QUEUE_SIZE,
+        batch_size: int = WRITE_BEHIND_BATCH_SIZE,
+        flush_interval: float = WRITE_BEHIND_FLUSH_INTERVAL
+    ):
+        self.write_batch = write_batch or location_utils.add_location_points
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._queue: "queue.Queue" = queue.Queue(maxsize=maxsize)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._done = threading.Condition(self._lock)
+        self._stopped = False
+
+        self.enqueued = 0
+        self.processed = 0
+        self.written = 0
+        self.rejected = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+        self.last_error: Optional[str] = None
+        self._latencies: deque = deque(maxlen=500)
+
+    def _start(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="location-write-behind", daemon=True)
+            self._thread.start()
+
+    def put(
+        self,
+        session_token: str,
+        point: Tuple,
+        block: bool = True,
+        timeout: Optional[float] = None
+    ) -> bool:
+        """Queue a (lat, lon[, accuracy[, timestamp]]) point or point dict.
+
+        Blocks while the queue is full (backpressure); returns False if the
+        point could not be queued within `timeout` or the queue is shut down.
+        """
+        with self._lock:
+            if self._stopped:
+                return False
+            self._start()
+        try:
+            self._queue.put((session_token, point), block=block, timeout=timeout)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+        with self._lock:
+            self.enqueued += 1
+        return True
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Write everything queued so far; returns False on timeout."""
+        with self._lock:
+            target = self.enqueued
+            if self.processed >= target:
+                return True
+            self._start()
+        self._queue.put(_FLUSH)
+        with self._done:
+            return self._done.wait_for(lambda: self.processed >= target, timeout)
+
+    def shutdown(self, flush: bool = True, timeout: Optional[float] = 10.0) -> None:
+        """Stop accepting points and stop the writer, by default after a final flush."""
+        with self._lock:
+            if self._stopped:
+                return
+            self._stopped = True
+            thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        if not flush:
+            self._discard_pending()
+        self._queue.put(_STOP)
+        thread.join(timeout)
+
+    def _discard_pending(self) -> None:
+        discarded = 0
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _FLUSH and item is not _STOP:
+                discarded += 1
+        with self._done:
+            self.dropped += discarded
+            self.processed += discarded
+            self._done.notify_all()
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            if item is _FLUSH:
+                continue
+
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            stop = False
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _FLUSH:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+
+            self._write(batch)
+            if stop:
+                return
+
+    def _write(self, batch: List[Tuple[str, Tuple]]) -> None:
+        by_session: Dict[str, List] = {}
+        for session_token, point in batch:
+            by_session.setdefault(session_token, []).append(point)
+
+        start = time.perf_counter()
+        written = failed = 0
+        for session_token, points in by_session.items():
+            try:
+                accepted = self.write_batch(session_token, points)
+                written += sum(accepted)
+            except Exception as e:
+                failed += len(points)
+                self.last_error = str(e)
+                print(f"Error writing queued location points: {e}")
+        latency = time.perf_counter() - start
+
+        with self._done:
+            self.batches += 1
+            self.written += written
+            self.failed += failed
+            self.rejected += len(batch) - written - failed
+            self.processed += len(batch)
+            self._latencies.append(latency)
+            self._done.notify_all()
+
+    def metrics(self) -> Dict:
+        """Return queue depth, throughput counters and flush latency."""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            return {
+                'queue_depth': self._queue.qsize(),
+                'capacity': self._queue.maxsize,
+                'enqueued': self.enqueued,
+                'written': self.written,
+                'rejected': self.rejected,
+                'dropped': self.dropped,
+                'failed': self.failed,
+                'batches': self.batches,
+                'avg_batch_size': self.processed / self.batches if self.batches else 0.0,
+                'p50_flush_latency': latencies[len(latencies) // 2] if latencies else 0.0,
+                'p95_flush_latency': latencies[int(len(latencies) * 0.95)] if latencies else 0.0,
+                'max_flush_latency': latencies[-1] if latencies else 0.0,
+                'last_error': self.last_error
+            }
+
+
+_writer: Optional[WriteBehindQueue] = None
+_writer_lock = threading.Lock()
+
+
+def get_writer() -> WriteBehindQueue:
+    """Return the process-wide write-behind queue; it is flushed at interpreter exit."""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                writer = WriteBehindQueue()
+                atexit.register(writer.shutdown)
+                _writer = writer
+    return _writer
+
+
+def queue_location_point(
+    session_token: str,
+    lat: float,
+    lon: float,
+    accuracy: float = None,
+    timestamp=None,
+    timeout: Optional[float] = None
+) -> bool:
+    """Queue a point for a background batched write; returns once it is queued.
+
+    The timestamp defaults to now, so points keep their capture time even
+    if they are written later. Invalid points and unknown sessions are only
+    detected by the writer and show up in get_writer().metrics()['rejected'].
+    """
+    if timestamp is None:
+        timestamp = datetime.now(timezone.utc)
+    return get_writer().put(session_token, (lat, lon, accuracy, timestamp), timeout=timeout)
+
+
+def flush(timeout: Optional[float] = None) -> bool:
+    """Wait until every queued point has been written."""
+    return get_writer().flush(timeout)
+
+
+def get_ingest_metrics() -> Dict:
+    """Return the write-behind queue metrics."""
+    return get_writer().metrics()
@@ -0,0 +1,212 @@
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from bisect import bisect_left, insort
+from typing import Dict, List, Optional
+
+# GeoGuesser scores; the SQLite table is the durable log behind the index
+GEOGUESSER_DB_PATH = os.getenv("GEOGUESSER_DB_PATH", "data/geoguesser.db")
+# Rows whose details are kept in memory, so top-N reads never touch SQLite
+TOP_DETAILS = 1000
+# How often reads pick up rows written by other processes (seconds)
+REFRESH_INTERVAL = 2.0
+
+_ID_BITS = 32
+
+
+def _sort_key(score: int, entry_id: int) -> int:
+    """Pack (score desc, id asc) into one int64 that sorts ascending."""
+    return (-score << _ID_BITS) | entry_id
+
+
+def _unpack_key(key: int):
+    return -(key >> _ID_BITS), key & ((1 << _ID_BITS) - 1)
+
+
+class LeaderboardIndex:
+    """In-memory rank index over the GeoGuesser leaderboard table.
+
+    Every score is kept as one packed int64 in a sorted array, so rank and
+    neighbourhood lookups are a binary search and top-N is a slice. Row
+    details are cached for the top TOP_DETAILS entries; anything deeper is
+    fetched by primary key.
+    """
+
+    def __init__(self, db_path: str = None):
+        self.db_path = db_path or GEOGUESSER_DB_PATH
+        self._keys = array('q')
+        self._details: Dict[int, Dict] = {}
+        self._last_id = 0
+        self._refreshed_at = 0.0
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
+
+    def _get_conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS leaderboard (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    username TEXT DEFAULT 'Anonymous',
+                    score INTEGER,
+                    rounds INTEGER,
+                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_leaderboard_score
+                ON leaderboard (score DESC, id)
+            ''')
+            self._conn = conn
+        return self._conn
+
+    def _refresh(self, force: bool = False) -> None:
+        """Index rows appended since the last refresh (by this or another process).
+
+        Only (id, score) pairs are read; row details are loaded on demand.
+        """
+        now = time.monotonic()
+        if not force and now - self._refreshed_at < REFRESH_INTERVAL:
+            return
+        rows = self._get_conn().execute(
+            'SELECT id, score FROM leaderboard WHERE id > ? ORDER BY id', (self._last_id,)
+        ).fetchall()
+        self._refreshed_at = now
+        if not rows:
+            return
+
+        if len(rows) > len(self._keys):
+            # Cold start: rebuild in one sort instead of many inserts
+            keys = list(self._keys)
+            keys.extend(_sort_key(score or 0, entry_id) for entry_id, score in rows)
+            keys.sort()
+            self._keys = array('q', keys)
+        else:
+            for entry_id, score in rows:
+                insort(self._keys, _sort_key(score or 0, entry_id))
+        self._last_id = rows[-1][0]
+        self._prune_details()
+
+    def _in_top(self, key: int) -> bool:
+        return len(self._keys) <= TOP_DETAILS or key <= self._keys[TOP_DETAILS - 1]
+
+    def _prune_details(self) -> None:
+        if len(self._details) > 2 * TOP_DETAILS:
+            keep = {_unpack_key(key)[1] for key in self._keys[:TOP_DETAILS]}
+            self._details = {i: d for i, d in self._details.items() if i in keep}
+
+    def _entries(self, keys) -> List[Dict]:
+        """Row dicts for packed keys, fetching uncached rows by primary key."""
+        ids = [_unpack_key(key)[1] for key in keys]
+        missing = [entry_id for entry_id in ids if entry_id not in self._details]
+        fetched = {}
+        if missing:
+            conn = self._get_conn()
+            for i in range(0, len(missing), 500):
+                chunk = missing[i:i + 500]
+                for entry_id, username, score, rounds, timestamp in conn.execute(f'''
+                    SELECT id, username, score, rounds, timestamp FROM leaderboard
+                    WHERE id IN ({','.join('?' * len(chunk))})
+                ''', chunk):
+                    entry = fetched[entry_id] = {
+                        'id': entry_id,
+                        'username': username,
+                        'score': score,
+                        'rounds': rounds,
+                        'timestamp': timestamp
+                    }
+                    if self._in_top(_sort_key(score or 0, entry_id)):
+                        self._details[entry_id] = entry
+        return [dict(self._details.get(i) or fetched[i]) for i in ids if i in self._details or i in fetched]
+
+    def add_score(self, username: str, score: int, rounds: int) -> Dict:
+        """Append a score to the durable log and index it; returns the entry with its rank."""
+        with self._lock:
+            self._refresh()
+            cursor = self._get_conn().execute('''
+                INSERT INTO leaderboard (username, score, rounds)
+                VALUES (?, ?, ?)
+            ''', (username or 'Anonymous', score, rounds))
+            entry_id = cursor.lastrowid
+
+            # Rows between the last refresh and this insert (other processes)
+            if entry_id != self._last_id + 1:
+                self._refresh(force=True)
+            else:
+                insort(self._keys, _sort_key(score, entry_id))
+                self._last_id = entry_id
+                self._prune_details()
+
+            entry = self._entries([_sort_key(score, entry_id)])[0]
+            entry['rank'] = self.rank(entry_id)
+            return entry
+
+    def top(self, limit: int = 10) -> List[Dict]:
+        """Return the best `limit` entries, highest score first."""
+        with self._lock:
+            self._refresh()
+            return self._entries(self._keys[:limit])
+
+    def rank_of_score(self, score: int) -> int:
+        """Return the rank a score would get (1 + the number of strictly higher scores)."""
+        with self._lock:
+            self._refresh()
+            return bisect_left(self._keys, _sort_key(score, 0)) + 1
+
+    def _position(self, entry_id: int) -> Optional[int]:
+        row = self._get_conn().execute(
+            'SELECT score FROM leaderboard WHERE id = ?', (entry_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        key = _sort_key(row[0] or 0, entry_id)
+        position = bisect_left(self._keys, key)
+        if position < len(self._keys) and self._keys[position] == key:
+            return position
+        return None
+
+    def rank(self, entry_id: int) -> Optional[int]:
+        """Return the 1-based rank of an entry (ties are ordered by entry id)."""
+        with self._lock:
+            self._refresh()
+            position = self._position(entry_id)
+            return None if position is None else position + 1
+
+    def around(self, entry_id: int, radius: int = 2) -> List[Dict]:
+        """Return the entry with up to `radius` neighbours on each side, with ranks."""
+        with self._lock:
+            self._refresh()
+            position = self._position(entry_id)
+            if position is None:
+                return []
+            start = max(0, position - radius)
+            entries = self._entries(self._keys[start:position + radius + 1])
+            for offset, entry in enumerate(entries):
+                entry['rank'] = start + offset + 1
+            return entries
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._keys)
+
+
+_leaderboards: Dict[str, LeaderboardIndex] = {}
+_leaderboards_lock = threading.Lock()
+
+
+def get_leaderboard_index(db_path: str = None) -> LeaderboardIndex:
+    """Return the process-wide leaderboard index for a database."""
+    db_path = db_path or GEOGUESSER_DB_PATH
+    with _leaderboards_lock:
+        index = _leaderboards.get(db_path)
+        if index is None:
+            index = _leaderboards[db_path] = LeaderboardIndex(db_path)
+        return index
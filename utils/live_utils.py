@@ -0,0 +1,272 @@
+import asyncio
+import json
+import os
+import threading
+import weakref
+from typing import Callable, Dict, List, Optional
+
+from utils import location_utils
+
+LIVE_HOST = os.getenv("LIVE_LOCATION_HOST", "127.0.0.1")
+LIVE_PORT = int(os.getenv("LIVE_LOCATION_PORT", "8765"))
+
+
+class Subscription:
+    """A viewer's mailbox for one group, holding only the newest update per member.
+
+    Updates published while the viewer is busy replace each other, so a slow
+    client drains at most one update per member instead of a backlog.
+    """
+
+    def __init__(self, broker: "LocationBroker", group_id: int):
+        self.broker = broker
+        self.group_id = group_id
+        self.closed = False
+        self.on_update: Optional[Callable[[], None]] = None
+        self._pending: Dict[int, Dict] = {}
+        self._cond = threading.Condition()
+
+    def offer(self, update: Dict) -> bool:
+        """Queue an update; returns True if it replaced an undelivered one."""
+        with self._cond:
+            replaced = update['user_id'] in self._pending
+            self._pending[update['user_id']] = update
+            self._cond.notify_all()
+        if self.on_update is not None:
+            self.on_update()
+        return replaced
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Wait up to `timeout` seconds for an update without taking it; returns whether one is pending."""
+        with self._cond:
+            return bool(self._cond.wait_for(lambda: self._pending or self.closed, timeout) and self._pending)
+
+    def poll(self, timeout: Optional[float] = 0) -> List[Dict]:
+        """Return and clear pending updates, waiting up to `timeout` seconds for one."""
+        with self._cond:
+            if not self._pending and timeout != 0:
+                self._cond.wait_for(lambda: self._pending or self.closed, timeout)
+            updates = list(self._pending.values())
+            self._pending.clear()
+        return updates
+
+    def close(self) -> None:
+        """Unsubscribe from the broker."""
+        self.closed = True
+        self.broker.unsubscribe(self)
+        with self._cond:
+            self._cond.notify_all()
+
+
+class LocationBroker:
+    """In-process pub/sub of member positions to group viewers.
+
+    A position is published once and offered to every subscription of the
+    member's groups. Subscriptions are held weakly, so viewers that go away
+    without closing (e.g. an ended Streamlit session) are dropped.
+    """
+
+    def __init__(self):
+        self._subscriptions: Dict[int, "weakref.WeakSet[Subscription]"] = {}
+        self._lock = threading.Lock()
+        self.published = 0
+        self.delivered = 0
+        self.coalesced = 0
+
+    def subscribe(self, group_id: int, snapshot: bool = True) -> Subscription:
+        """Subscribe to a group, optionally pre-filled with each member's last position."""
+        subscription = Subscription(self, group_id)
+        if snapshot:
+            for member in location_utils.get_group_snapshot(group_id):
+                if 'location' in member:
+                    subscription.offer({'user_id': member['id'], **member['location']})
+        with self._lock:
+            self._subscriptions.setdefault(group_id, weakref.WeakSet()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.group_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.group_id]
+
+    def has_subscribers(self) -> bool:
+        with self._lock:
+            return any(self._subscriptions.values())
+
+    def publish(self, user_id: int, location: Dict, group_ids: List[int]) -> int:
+        """Offer a member's position to the viewers of their groups; returns the number reached."""
+        update = {'user_id': user_id, **location}
+        with self._lock:
+            targets = [
+                subscription
+                for group_id in group_ids
+                for subscription in self._subscriptions.get(group_id, ())
+            ]
+            self.published += 1
+        coalesced = sum(subscription.offer(update) for subscription in targets)
+        with self._lock:
+            self.delivered += len(targets)
+            self.coalesced += coalesced
+        return len(targets)
+
+    def on_point(self, session_id: int, point: Dict) -> None:
+        """location_utils point listener: publish stored points of grouped users."""
+        if not self.has_subscribers():
+            return
+        user_id, group_ids = location_utils.get_session_groups(session_id)
+        if user_id is not None:
+            self.publish(user_id, point, group_ids)
+
+    def metrics(self) -> Dict:
+        """Return subscriber counts and publish/delivery counters."""
+        with self._lock:
+            return {
+                'groups': len(self._subscriptions),
+                'subscriptions': sum(len(subscriptions) for subscriptions in self._subscriptions.values()),
+                'published': self.published,
+                'delivered': self.delivered,
+                'coalesced': self.coalesced
+            }
+
+
+_broker: Optional[LocationBroker] = None
+_broker_lock = threading.Lock()
+
+
+def get_broker() -> LocationBroker:
+    """Return the process-wide broker, subscribed to points stored by location_utils."""
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                broker = LocationBroker()
+                location_utils.add_point_listener(broker.on_point)
+                _broker = broker
+    return _broker
+
+
+async def _handle_client(websocket, broker: LocationBroker) -> None:
+    """Serve one websocket client.
+
+    The first message authenticates with the client's tracking session:
+    {"action": "auth", "session_token": ".."}. Viewers then send
+    {"action": "subscribe", "group_id": 1} for a group they belong to and
+    receive JSON lists of member updates. Publishers send {"action":
+    "publish", "latitude": .., "longitude": .., "accuracy": ..,
+    "timestamp": ..}; the point is stored in the session's history, which
+    publishes it as the session's user to that user's groups. Database calls
+    run in worker threads so they never block the event loop.
+    """
+    loop = asyncio.get_running_loop()
+    ready = asyncio.Event()
+    subscription: Optional[Subscription] = None
+    session_token: Optional[str] = None
+
+    async def push_updates():
+        while True:
+            await ready.wait()
+            ready.clear()
+            updates = subscription.poll()
+            if updates:
+                # While this send is in flight, newer updates coalesce in the mailbox
+                await websocket.send(json.dumps(updates))
+
+    sender = None
+    try:
+        async for message in websocket:
+            try:
+                request = json.loads(message)
+                action = request.get('action')
+                if session_token is None:
+                    user_id, _ = await asyncio.to_thread(
+                        location_utils.get_session_member, str(request.get('session_token'))
+                    )
+                    if action != 'auth' or user_id is None:
+                        await websocket.close(code=4401, reason='Authentication required')
+                        return
+                    session_token = request['session_token']
+                    await websocket.send(json.dumps({'authenticated': True, 'user_id': user_id}))
+                    continue
+
+                # Membership is checked on every request, so leaving a group or
+                # ending the session takes effect immediately
+                user_id, group_ids = await asyncio.to_thread(location_utils.get_session_member, session_token)
+                if user_id is None:
+                    await websocket.close(code=4401, reason='Session ended')
+                    return
+                if action == 'subscribe' and subscription is None:
+                    group_id = int(request['group_id'])
+                    if group_id not in group_ids:
+                        await websocket.send(json.dumps({'error': f"Not a member of group {group_id}"}))
+                        continue
+                    subscription = await asyncio.to_thread(broker.subscribe, group_id)
+                    subscription.on_update = lambda: loop.call_soon_threadsafe(ready.set)
+                    ready.set()
+                    sender = asyncio.ensure_future(push_updates())
+                elif action == 'publish':
+                    point = {
+                        'latitude': float(request['latitude']),
+                        'longitude': float(request['longitude']),
+                        'accuracy': request.get('accuracy'),
+                        'timestamp': request.get('timestamp')
+                    }
+                    # Storing the point publishes it through the broker's point listener
+                    accepted, = await asyncio.to_thread(location_utils.add_location_points, session_token, [point])
+                    if not accepted:
+                        await websocket.send(json.dumps({'error': 'Point rejected'}))
+                else:
+                    await websocket.send(json.dumps({'error': f"Unsupported action: {action}"}))
+            except (ValueError, KeyError, TypeError) as e:
+                await websocket.send(json.dumps({'error': str(e)}))
+    finally:
+        if sender is not None:
+            sender.cancel()
+        if subscription is not None:
+            subscription.close()
+
+
+async def serve(host: str = LIVE_HOST, port: int = LIVE_PORT, broker: LocationBroker = None) -> None:
+    """Run the websocket fan-out server until cancelled."""
+    import websockets
+
+    broker = broker or get_broker()
+    # Points stored by this process, including published ones, reach the viewers
+    location_utils.add_point_listener(broker.on_point)
+    async with websockets.serve(lambda ws: _handle_client(ws, broker), host, port):
+        await asyncio.Future()
+
+
+_server_thread: Optional[threading.Thread] = None
+# Why the server thread stopped (e.g. the port is taken); it is not restarted
+server_error: Optional[str] = None
+
+
+def _run_server(host: str, port: int) -> None:
+    global server_error
+    try:
+        asyncio.run(serve(host, port))
+    except Exception as e:
+        server_error = str(e)
+        print(f"Live location server stopped: {e}")
+
+
+def start_server_thread(host: str = LIVE_HOST, port: int = LIVE_PORT) -> threading.Thread:
+    """Serve the process-wide broker over websockets from a daemon thread (once per process).
+
+    The server runs in the app's process so it shares the broker that
+    location_utils publishes stored points to.
+    """
+    global _server_thread
+    with _broker_lock:
+        if server_error is None and (_server_thread is None or not _server_thread.is_alive()):
+            _server_thread = threading.Thread(
+                target=_run_server,
+                args=(host, port),
+                name="live-location-server",
+                daemon=True
+            )
+            _server_thread.start()
+    return _server_thread
@@ -1,17 +1,157 @@
 import sqlite3
+import math
 import os
-from datetime import datetime
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
 import secrets
-from typing import Dict, List, Optional, Tuple
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 import json
 
+import numpy as np
+
+from utils.archive_utils import COORDINATE_SCALE, decode_track, encode_track
+from utils.database import get_registry, get_sqlite_connection
+from utils.leaderboard_utils import get_leaderboard_index
+
 # Database path
 DB_PATH = "location_services.db"
 
+# Applied to every new connection. WAL lets readers and the writer proceed
+# concurrently; synchronous=NORMAL is durable across app crashes in WAL mode.
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-16000",  # 16 MB page cache
+    "PRAGMA mmap_size=268435456",  # 256 MB
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000"
+)
+
+# Rows fetched per keyset page when streaming history
+HISTORY_PAGE_SIZE = 2000
+HISTORY_COLUMNS = ('id', 'latitude', 'longitude', 'timestamp', 'accuracy')
+# SQL for the array-mode timestamp column: UNIX seconds, millisecond precision
+TIMESTAMP_SECONDS_SQL = "round((julianday(timestamp) - 2440587.5) * 86400000.0) / 1000.0"
+
+# Rollup levels in meters: a point is kept at a level once it is this far
+# from the last point kept there. Each level is a subset of the finer one.
+# Roughly 2 px steps at zooms 14, 12, 10, 8 and 6.
+ROLLUP_RESOLUTIONS = (10, 50, 200, 1000, 5000)
+METERS_PER_DEGREE = 111320.0
+
+# Databases already brought up to date by this process
+_migrated_paths = set()
+
+# Active session ids by (DB_PATH, session_token); dropped when a session ends
+_session_ids: Dict[Tuple[str, str], int] = {}
+
+# Group snapshots by (DB_PATH, group_id) as (created, member ids, members).
+# Dropped when a member joins or posts a point; the TTL only covers writes
+# from other processes.
+GROUP_SNAPSHOT_TTL = 30  # seconds
+_group_snapshots: Dict[Tuple[str, int], Tuple[float, set, List[Dict]]] = {}
+_group_snapshots_lock = threading.Lock()
+
+# Callbacks run with (session_id, newest point dict) after points are stored
+_point_listeners: List[Callable[[int, Dict], None]] = []
+
+# Last rolled-up (lat, lon) per level by (DB_PATH, session_id)
+_rollup_tails: Dict[Tuple[str, int], List[Optional[Tuple[float, float]]]] = {}
+
+def _setup_connection(conn: sqlite3.Connection) -> None:
+    for pragma in SQLITE_PRAGMAS:
+        conn.execute(pragma)
+    if DB_PATH not in _migrated_paths:
+        migrate(conn)
+        _migrated_paths.add(DB_PATH)
+
+def get_connection() -> sqlite3.Connection:
+    """Return this thread's connection to DB_PATH from the connection registry.
+
+    Connections run in autocommit mode; use transaction() to group writes.
+    Compiled statements are reused through sqlite3's per-connection cache.
+    """
+    return get_sqlite_connection(DB_PATH, _setup_connection)
+
+@contextmanager
+def transaction(immediate: bool = True) -> Iterator[sqlite3.Connection]:
+    """Run a block in one transaction on this thread's connection.
+
+    Commits on success and rolls back on error. Nested blocks join the
+    outer transaction.
+    """
+    conn = get_connection()
+    if conn.in_transaction:
+        yield conn
+        return
+
+    conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+def close_connection():
+    """Close this thread's database connections and the idle pooled ones."""
+    get_registry().close()
+
 def init_db():
-    """Initialize the SQLite database with required tables."""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
+    """Initialize the SQLite database with required tables and indexes."""
+    migrate(get_connection())
+    for name, plan in check_query_plans().items():
+        print(f"Warning: hot-path query '{name}' is not index-backed: {plan}")
+
+def migrate(conn: sqlite3.Connection) -> List[int]:
+    """Apply pending schema migrations in order; returns the versions applied.
+
+    Applied versions are recorded in schema_migrations, so existing
+    databases are upgraded in place and each step runs exactly once.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    applied = {row[0] for row in conn.execute('SELECT version FROM schema_migrations')}
+
+    newly_applied = []
+    for version, description, steps in MIGRATIONS:
+        if version in applied:
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Another process may have migrated while we waited for the lock
+            if conn.execute('SELECT 1 FROM schema_migrations WHERE version = ?', (version,)).fetchone():
+                conn.execute("COMMIT")
+                continue
+            if callable(steps):
+                steps(conn.cursor())
+            else:
+                for statement in steps:
+                    conn.execute(statement)
+            conn.execute(
+                'INSERT INTO schema_migrations (version, description) VALUES (?, ?)',
+                (version, description)
+            )
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        newly_applied.append(version)
+    return newly_applied
+
+def schema_version(conn: Optional[sqlite3.Connection] = None) -> int:
+    """Return the highest applied migration version."""
+    conn = conn or get_connection()
+    return conn.execute('SELECT COALESCE(MAX(version), 0) FROM schema_migrations').fetchone()[0]
+
+def _create_tables(c: sqlite3.Cursor):
     
     # Create users table
     c.execute('''
@@ -83,9 +223,227 @@ def init_db():
             FOREIGN KEY (user_id) REFERENCES users (id)
         )
     ''')
-    
-    conn.commit()
-    conn.close()
+
+def _create_rollups(c: sqlite3.Cursor):
+    """Create the rollup table and build rollups for existing points."""
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS location_rollups (
+            session_id INTEGER NOT NULL,
+            level INTEGER NOT NULL,
+            timestamp TIMESTAMP NOT NULL,
+            point_id INTEGER NOT NULL,
+            latitude REAL NOT NULL,
+            longitude REAL NOT NULL,
+            accuracy REAL,
+            PRIMARY KEY (session_id, level, timestamp, point_id)
+        ) WITHOUT ROWID
+    ''')
+    session_ids = [row[0] for row in c.execute('SELECT DISTINCT session_id FROM location_points')]
+    for session_id in session_ids:
+        rows = c.execute('''
+            SELECT id, latitude, longitude FROM location_points
+            WHERE session_id = ? ORDER BY timestamp, id
+        ''', (session_id,)).fetchall()
+        _insert_rollups(c, session_id, rows, [None] * len(ROLLUP_RESOLUTIONS))
+
+# Schema migrations as (version, description, steps). Steps are SQL
+# statements or a callable taking a cursor. Append only; never edit a
+# released migration.
+MIGRATIONS = [
+    (1, "initial schema", _create_tables),
+    (2, "hot-path indexes", [
+        # Token lookups already use the UNIQUE(session_token) index.
+        # History reads by session in time order, covering the selected columns
+        '''CREATE INDEX IF NOT EXISTS idx_location_points_session_time
+           ON location_points (session_id, timestamp, latitude, longitude, accuracy)''',
+        '''CREATE INDEX IF NOT EXISTS idx_group_members_group
+           ON group_members (group_id, user_id, permissions, joined_at)'''
+    ]),
+    (3, "R*Tree spatial index over location_points", [
+        # Points are stored as degenerate boxes; the triggers keep it in sync
+        '''CREATE VIRTUAL TABLE IF NOT EXISTS location_points_rtree
+           USING rtree(id, min_lat, max_lat, min_lon, max_lon)''',
+        '''INSERT INTO location_points_rtree (id, min_lat, max_lat, min_lon, max_lon)
+           SELECT id, latitude, latitude, longitude, longitude FROM location_points''',
+        '''CREATE TRIGGER IF NOT EXISTS location_points_rtree_insert
+           AFTER INSERT ON location_points BEGIN
+               INSERT INTO location_points_rtree (id, min_lat, max_lat, min_lon, max_lon)
+               VALUES (new.id, new.latitude, new.latitude, new.longitude, new.longitude);
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS location_points_rtree_update
+           AFTER UPDATE OF latitude, longitude ON location_points BEGIN
+               UPDATE location_points_rtree
+               SET min_lat = new.latitude, max_lat = new.latitude,
+                   min_lon = new.longitude, max_lon = new.longitude
+               WHERE id = new.id;
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS location_points_rtree_delete
+           AFTER DELETE ON location_points BEGIN
+               DELETE FROM location_points_rtree WHERE id = old.id;
+           END'''
+    ]),
+    (4, "keyset-ordered history index", [
+        # Same index with id after timestamp, so (timestamp, id) pages are
+        # read in index order without a sort
+        'DROP INDEX IF EXISTS idx_location_points_session_time',
+        '''CREATE INDEX IF NOT EXISTS idx_location_points_session_time
+           ON location_points (session_id, timestamp, id, latitude, longitude, accuracy)'''
+    ]),
+    (5, "compressed archives of ended sessions", [
+        # One blob per archived session (see utils.archive_utils); the
+        # bounds let bbox and time queries skip archives without decoding
+        '''CREATE TABLE IF NOT EXISTS session_archives (
+            session_id INTEGER PRIMARY KEY,
+            point_count INTEGER NOT NULL,
+            start_time TIMESTAMP,
+            end_time TIMESTAMP,
+            min_lat REAL,
+            max_lat REAL,
+            min_lon REAL,
+            max_lon REAL,
+            data BLOB NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (session_id) REFERENCES tracking_sessions (id)
+        )'''
+    ]),
+    (6, "multi-resolution history rollups", _create_rollups),
+    (7, "latest position per user", [
+        '''CREATE TABLE IF NOT EXISTS member_latest_location (
+            user_id INTEGER PRIMARY KEY,
+            session_id INTEGER NOT NULL,
+            point_id INTEGER NOT NULL,
+            latitude REAL NOT NULL,
+            longitude REAL NOT NULL,
+            accuracy REAL,
+            timestamp TIMESTAMP NOT NULL
+        )''',
+        '''INSERT OR REPLACE INTO member_latest_location
+               (user_id, session_id, point_id, latitude, longitude, accuracy, timestamp)
+           SELECT user_id, session_id, id, latitude, longitude, accuracy, timestamp FROM (
+               SELECT ts.user_id, lp.session_id, lp.id, lp.latitude, lp.longitude,
+                      lp.accuracy, lp.timestamp,
+                      ROW_NUMBER() OVER (
+                          PARTITION BY ts.user_id ORDER BY lp.timestamp DESC, lp.id DESC
+                      ) AS position
+               FROM location_points lp
+               JOIN tracking_sessions ts ON lp.session_id = ts.id
+               WHERE ts.user_id IS NOT NULL
+           ) WHERE position = 1''',
+        # Points with an older timestamp (e.g. late uploads) do not move it back
+        '''CREATE TRIGGER IF NOT EXISTS member_latest_location_insert
+           AFTER INSERT ON location_points BEGIN
+               INSERT INTO member_latest_location
+                   (user_id, session_id, point_id, latitude, longitude, accuracy, timestamp)
+               SELECT user_id, new.session_id, new.id, new.latitude, new.longitude,
+                      new.accuracy, new.timestamp
+               FROM tracking_sessions WHERE id = new.session_id AND user_id IS NOT NULL
+               ON CONFLICT (user_id) DO UPDATE SET
+                   session_id = excluded.session_id,
+                   point_id = excluded.point_id,
+                   latitude = excluded.latitude,
+                   longitude = excluded.longitude,
+                   accuracy = excluded.accuracy,
+                   timestamp = excluded.timestamp
+               WHERE excluded.timestamp >= member_latest_location.timestamp;
+           END'''
+    ]),
+    (8, "group lookup by member", [
+        '''CREATE INDEX IF NOT EXISTS idx_group_members_user
+           ON group_members (user_id, group_id)'''
+    ]),
+]
+
+SESSION_LOOKUP_SQL = '''
+    SELECT id FROM tracking_sessions WHERE session_token = ? AND is_active = TRUE
+'''
+
+# One keyset page of a session's history; {columns} and {until} are filled
+# from whitelisted fragments only
+LOCATION_HISTORY_PAGE_SQL = '''
+    SELECT timestamp, id{columns}
+    FROM location_points
+    WHERE session_id = ? AND (timestamp, id) > (?, ?){until}
+    ORDER BY timestamp, id
+    LIMIT ?
+'''
+LOCATION_HISTORY_SQL = LOCATION_HISTORY_PAGE_SQL.format(
+    columns=', latitude, longitude, accuracy',
+    until=' AND timestamp <= ?'
+)
+
+ARCHIVE_POINTS_SQL = '''
+    SELECT id, latitude, longitude,
+           CAST(round((julianday(timestamp) - 2440587.5) * 86400000.0) AS INTEGER),
+           accuracy
+    FROM location_points
+    WHERE session_id = ?
+    ORDER BY timestamp, id
+'''
+
+# Copies a stored point into a rollup level; params are (level, point id)
+ROLLUP_INSERT_SQL = '''
+    INSERT OR IGNORE INTO location_rollups
+        (session_id, level, timestamp, point_id, latitude, longitude, accuracy)
+    SELECT session_id, ?, timestamp, id, latitude, longitude, accuracy
+    FROM location_points WHERE id = ?
+'''
+
+GROUP_MEMBERS_SQL = '''
+    SELECT u.id, u.username, gm.permissions, gm.joined_at
+    FROM group_members gm
+    JOIN users u ON gm.user_id = u.id
+    WHERE gm.group_id = ?
+'''
+
+GROUP_SNAPSHOT_SQL = '''
+    SELECT u.id, u.username, gm.permissions, gm.joined_at,
+           ml.latitude, ml.longitude, ml.accuracy, ml.timestamp
+    FROM group_members gm
+    JOIN users u ON gm.user_id = u.id
+    LEFT JOIN member_latest_location ml ON ml.user_id = gm.user_id
+    WHERE gm.group_id = ?
+'''
+
+SESSION_GROUPS_SQL = '''
+    SELECT ts.user_id, gm.group_id
+    FROM tracking_sessions ts
+    JOIN group_members gm ON gm.user_id = ts.user_id
+    WHERE ts.id = ?
+'''
+
+# Hot-path queries and the index each must use
+HOT_PATH_QUERIES = {
+    'session_lookup': (SESSION_LOOKUP_SQL, ('token',), 'sqlite_autoindex_tracking_sessions_1'),
+    'location_history': (LOCATION_HISTORY_SQL, (1, '', 0, '9999', 100), 'idx_location_points_session_time'),
+    'group_members': (GROUP_MEMBERS_SQL, (1,), 'idx_group_members_group'),
+    'group_snapshot': (GROUP_SNAPSHOT_SQL, (1,), 'idx_group_members_group'),
+    'session_groups': (SESSION_GROUPS_SQL, (1,), 'idx_group_members_user'),
+}
+
+def explain_query_plan(sql: str, params: Tuple = ()) -> List[str]:
+    """Return the EXPLAIN QUERY PLAN detail lines for a query."""
+    get_connection()  # make sure migrations have run
+    # A fresh connection: cached EXPLAIN statements are not re-planned after schema changes
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+    finally:
+        conn.close()
+
+def check_query_plans() -> Dict[str, List[str]]:
+    """Report hot-path queries that no longer use their index, scan or sort.
+
+    Returns {query name: plan lines} for each offending query; an empty dict
+    means every hot path is served by its index.
+    """
+    problems = {}
+    for name, (sql, params, index) in HOT_PATH_QUERIES.items():
+        plan = explain_query_plan(sql, params)
+        uses_index = any(index in line for line in plan)
+        scans = any(line.startswith('SCAN') or 'TEMP B-TREE' in line for line in plan)
+        if not uses_index or scans:
+            problems[name] = plan
+    return problems
 
 def generate_session_token() -> str:
     """Generate a secure random session token."""
@@ -94,132 +452,721 @@ def generate_session_token() -> str:
 def create_tracking_session(user_id: int) -> str:
     """Create a new tracking session and return the session token."""
     session_token = generate_session_token()
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
+    conn = get_connection()
     
-    c.execute('''
+    conn.execute('''
         INSERT INTO tracking_sessions (user_id, session_token)
         VALUES (?, ?)
     ''', (user_id, session_token))
     
-    conn.commit()
-    conn.close()
     return session_token
 
-def add_location_point(session_token: str, lat: float, lon: float, accuracy: float) -> bool:
-    """Add a new location point to an active tracking session."""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    
-    # Get session ID
-    c.execute('SELECT id FROM tracking_sessions WHERE session_token = ? AND is_active = TRUE', 
-              (session_token,))
-    result = c.fetchone()
-    
-    if result:
-        session_id = result[0]
-        c.execute('''
-            INSERT INTO location_points (session_id, latitude, longitude, accuracy)
-            VALUES (?, ?, ?, ?)
-        ''', (session_id, lat, lon, accuracy))
-        
-        conn.commit()
-        conn.close()
-        return True
-    
-    conn.close()
-    return False
+def _resolve_session(conn: sqlite3.Connection, session_token: str) -> Optional[int]:
+    """Return the id of an active session, caching token -> id per process."""
+    key = (DB_PATH, session_token)
+    session_id = _session_ids.get(key)
+    if session_id is None:
+        result = conn.execute(SESSION_LOOKUP_SQL, (session_token,)).fetchone()
+        if result:
+            session_id = _session_ids[key] = result[0]
+    return session_id
 
-def get_location_history(session_token: str) -> List[Dict]:
-    """Get location history for a tracking session."""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    
-    c.execute('''
-        SELECT lp.latitude, lp.longitude, lp.timestamp, lp.accuracy
-        FROM location_points lp
-        JOIN tracking_sessions ts ON lp.session_id = ts.id
-        WHERE ts.session_token = ?
-        ORDER BY lp.timestamp ASC
-    ''', (session_token,))
-    
-    results = c.fetchall()
-    conn.close()
-    
+def _format_timestamp(value) -> Optional[str]:
+    """Normalize a point timestamp to SQLite's UTC 'YYYY-MM-DD HH:MM:SS' text.
+
+    Strings are parsed as ISO 8601 (a 'T' separator and a UTC offset are
+    accepted), so they compare the same way as the stored text. Raises
+    ValueError for anything that is not a valid time.
+    """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if isinstance(value, (int, float)):
+        try:
+            value = datetime.fromtimestamp(value, timezone.utc)
+        except (OverflowError, OSError) as e:
+            raise ValueError(f"Invalid timestamp: {value!r}") from e
+    if not isinstance(value, datetime):
+        raise ValueError(f"Invalid timestamp: {value!r}")
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.isoformat(sep=' ', timespec='seconds' if not value.microsecond else 'milliseconds')
+
+def _point_row(session_id: int, point) -> Optional[Tuple]:
+    """Build an insert row from a point dict or (lat, lon[, accuracy[, timestamp]]) tuple.
+
+    Returns None for out-of-range coordinates or an unparseable timestamp.
+    """
+    try:
+        if isinstance(point, dict):
+            lat, lon = float(point['latitude']), float(point['longitude'])
+            accuracy, timestamp = point.get('accuracy'), point.get('timestamp')
+        else:
+            lat, lon = float(point[0]), float(point[1])
+            accuracy = point[2] if len(point) > 2 else None
+            timestamp = point[3] if len(point) > 3 else None
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            return None
+        return (session_id, lat, lon, _format_timestamp(timestamp), accuracy)
+    except (KeyError, IndexError, TypeError, ValueError, AttributeError):
+        return None
+
+def add_location_points(session_token: str, points: Iterable) -> List[bool]:
+    """Add a batch of location points to an active tracking session.
+
+    Points are dicts with latitude/longitude and optional accuracy/timestamp,
+    or (lat, lon[, accuracy[, timestamp]]) tuples. The session is resolved
+    once and all valid points are inserted in a single transaction. Returns
+    per-point acceptance; invalid coordinates or timestamps are rejected,
+    and every point is rejected if the session is unknown or ended.
+    """
+    points = list(points)
+    session_id = None
+    try:
+        with transaction() as conn:
+            session_id = _resolve_session(conn, session_token)
+            if session_id is None:
+                return [False] * len(points)
+
+            rows = [_point_row(session_id, point) for point in points]
+            valid = [row for row in rows if row is not None]
+            conn.executemany('''
+                INSERT INTO location_points (session_id, latitude, longitude, timestamp, accuracy)
+                VALUES (?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP), ?)
+            ''', valid)
+
+            if valid:
+                # The write lock is held, so the batch got consecutive AUTOINCREMENT ids
+                last_id = conn.execute('SELECT last_insert_rowid()').fetchone()[0]
+                first_id = last_id - len(valid) + 1
+                # Cached before the lock is released, so the next writer
+                # extends these tails rather than the ones this batch read
+                _rollup_tails[(DB_PATH, session_id)] = _insert_rollups(
+                    conn, session_id,
+                    [(first_id + i, row[1], row[2]) for i, row in enumerate(valid)],
+                    _load_rollup_tails(conn, session_id)
+                )
+    except BaseException:
+        # Rolled back: the cached tails may name points that were never stored
+        _rollup_tails.pop((DB_PATH, session_id), None)
+        raise
+
+    if valid:
+        _invalidate_session_snapshots(session_id)
+        _notify_point_listeners(session_id, valid[-1])
+    return [row is not None for row in rows]
+
+def add_point_listener(callback: Callable[[int, Dict], None]) -> None:
+    """Call `callback(session_id, point)` with the newest point of every stored batch."""
+    if callback not in _point_listeners:
+        _point_listeners.append(callback)
+
+def remove_point_listener(callback: Callable[[int, Dict], None]) -> None:
+    """Stop calling a callback registered with add_point_listener()."""
+    if callback in _point_listeners:
+        _point_listeners.remove(callback)
+
+def _notify_point_listeners(session_id: int, row: Tuple) -> None:
+    if not _point_listeners:
+        return
+    _, lat, lon, timestamp, accuracy = row
+    point = {
+        'latitude': lat,
+        'longitude': lon,
+        'accuracy': accuracy,
+        'timestamp': timestamp or _format_timestamp(datetime.now(timezone.utc).replace(microsecond=0))
+    }
+    for callback in list(_point_listeners):
+        try:
+            callback(session_id, point)
+        except Exception as e:
+            print(f"Error in location point listener: {e}")
+
+def get_session_member(session_token: str) -> Tuple[Optional[int], List[int]]:
+    """Return the user and groups behind an active tracking session token ((None, []) if unknown or ended)."""
+    conn = get_connection()
+    session_id = _resolve_session(conn, session_token)
+    if session_id is None:
+        return None, []
+    user_id, group_ids = get_session_groups(session_id)
+    if user_id is None:
+        user_id = conn.execute(
+            'SELECT user_id FROM tracking_sessions WHERE id = ?', (session_id,)
+        ).fetchone()[0]
+    return user_id, group_ids
+
+def get_session_groups(session_id: int) -> Tuple[Optional[int], List[int]]:
+    """Return the user of a tracking session and that user's groups ((None, []) if in none)."""
+    rows = get_connection().execute(SESSION_GROUPS_SQL, (session_id,)).fetchall()
+    if not rows:
+        return None, []
+    return rows[0][0], [group_id for _, group_id in rows]
+
+def _load_rollup_tails(conn: sqlite3.Connection, session_id: int) -> List[Optional[Tuple[float, float]]]:
+    """Return the last rolled-up point per level, from the cache or the database."""
+    tails = _rollup_tails.get((DB_PATH, session_id))
+    if tails is not None:
+        return list(tails)
     return [
-        {
-            'latitude': lat,
-            'longitude': lon,
-            'timestamp': timestamp,
-            'accuracy': accuracy
+        conn.execute('''
+            SELECT latitude, longitude FROM location_rollups
+            WHERE session_id = ? AND level = ?
+            ORDER BY timestamp DESC, point_id DESC LIMIT 1
+        ''', (session_id, level)).fetchone()
+        for level in range(len(ROLLUP_RESOLUTIONS))
+    ]
+
+def _insert_rollups(conn, session_id: int, points: List[Tuple[int, float, float]], tails: List) -> List:
+    """Add new (id, lat, lon) points to the rollup levels they qualify for.
+
+    Returns the updated per-level tails.
+    """
+    selected, tails = _select_rollups(points, tails)
+    conn.executemany(ROLLUP_INSERT_SQL, selected)
+    return tails
+
+def _select_rollups(points: Iterable[Tuple[int, float, float]], tails: List) -> Tuple[List[Tuple[int, int]], List]:
+    """Return the (level, id) pairs rolling up (id, lat, lon) points, and the new tails.
+
+    A point is tested against a level only if the finer level kept it, so
+    the levels nest.
+    """
+    selected = []
+    for point_id, lat, lon in points:
+        cos_lat = math.cos(math.radians(lat))
+        for level, resolution in enumerate(ROLLUP_RESOLUTIONS):
+            tail = tails[level]
+            if tail is not None:
+                dy = (lat - tail[0]) * METERS_PER_DEGREE
+                dx = (lon - tail[1]) * METERS_PER_DEGREE * cos_lat
+                if dx * dx + dy * dy < resolution * resolution:
+                    break
+            tails[level] = (lat, lon)
+            selected.append((level, point_id))
+    return selected, tails
+
+def add_location_point(
+    session_token: str,
+    lat: float,
+    lon: float,
+    accuracy: float,
+    write_behind: bool = False
+) -> bool:
+    """Add a new location point to an active tracking session.
+
+    With write_behind=True the point is queued for a batched background
+    write (utils.ingest_utils) and True only means it was queued; call
+    ingest_utils.flush() before reading it back.
+    """
+    if write_behind:
+        # Imported here: ingest_utils builds on this module
+        from utils.ingest_utils import queue_location_point
+        return queue_location_point(session_token, lat, lon, accuracy)
+    return add_location_points(session_token, [(lat, lon, accuracy)])[0]
+
+def _history_session_id(conn: sqlite3.Connection, session_token: str) -> Optional[int]:
+    """Return the id of a session, active or ended."""
+    result = conn.execute(
+        'SELECT id FROM tracking_sessions WHERE session_token = ?', (session_token,)
+    ).fetchone()
+    return result[0] if result else None
+
+def _timestamp_ms(value) -> int:
+    """Convert a timestamp (text, datetime or UNIX seconds) to UNIX milliseconds."""
+    text = _format_timestamp(value)
+    return int(np.datetime64(text.replace(' ', 'T'), 'ms').astype(np.int64))
+
+def _format_timestamps_ms(values: np.ndarray) -> List[str]:
+    """Format UNIX milliseconds the way SQLite stores point timestamps."""
+    texts = np.datetime_as_string(np.asarray(values, dtype=np.int64).astype('datetime64[ms]'), unit='ms')
+    return [
+        text[:-4].replace('T', ' ') if text.endswith('.000') else text.replace('T', ' ')
+        for text in texts.tolist()
+    ]
+
+def _load_archive(conn: sqlite3.Connection, session_id: int) -> Optional[Dict[str, np.ndarray]]:
+    """Return the decoded archive columns of a session, or None if it is not archived."""
+    row = conn.execute(
+        'SELECT data FROM session_archives WHERE session_id = ?', (session_id,)
+    ).fetchone()
+    return decode_track(row[0]) if row else None
+
+def _archive_rows(archive: Dict[str, np.ndarray], indexes: np.ndarray, columns: Tuple[str, ...]) -> List[Dict]:
+    """Build point dicts, shaped like live rows, for selected archive positions."""
+    values = {}
+    for column in columns:
+        if column == 'timestamp':
+            values[column] = _format_timestamps_ms(archive['timestamp_ms'][indexes])
+        elif column == 'accuracy':
+            accuracy = archive['accuracy'][indexes]
+            values[column] = [None if a != a else a for a in accuracy.tolist()]
+        else:
+            values[column] = archive[column][indexes].tolist()
+    return [dict(zip(columns, row)) for row in zip(*(values[column] for column in columns))]
+
+def _archive_pages(
+    archive: Dict[str, np.ndarray],
+    columns: Tuple[str, ...],
+    since,
+    until,
+    page_size: int,
+    as_arrays: bool
+) -> Iterator:
+    """Page through a decoded archive like iter_location_history_pages()."""
+    times = archive['timestamp_ms']
+    start, end = _archive_bounds(times, since, until)
+
+    for offset in range(start, end, page_size):
+        indexes = np.arange(offset, min(offset + page_size, end))
+        if as_arrays:
+            yield {
+                column: times[indexes] / 1000.0 if column == 'timestamp' else archive[column][indexes]
+                for column in columns
+            }
+        else:
+            yield _archive_rows(archive, indexes, columns)
+
+def _archive_bounds(times: np.ndarray, since, until) -> Tuple[int, int]:
+    """Return the [start, end) archive positions within inclusive time bounds."""
+    start = np.searchsorted(times, _timestamp_ms(since), 'left') if since is not None else 0
+    end = np.searchsorted(times, _timestamp_ms(until), 'right') if until is not None else len(times)
+    return int(start), int(end)
+
+def _archive_rollup(
+    archive: Dict[str, np.ndarray],
+    level: int,
+    columns: Tuple[str, ...],
+    since,
+    until,
+    as_arrays: bool
+):
+    """Rebuild a rollup level from a decoded archive, shaped like get_location_history().
+
+    Archived sessions keep no location_rollups rows; the level is selected
+    again from the whole track, then bounded and closed with the newest
+    point like _rollup_history().
+    """
+    times = archive['timestamp_ms']
+    selected, _ = _select_rollups(
+        zip(range(len(times)), archive['latitude'].tolist(), archive['longitude'].tolist()),
+        [None] * len(ROLLUP_RESOLUTIONS)
+    )
+    indexes = np.array([index for point_level, index in selected if point_level == level], dtype=np.int64)
+    start, end = _archive_bounds(times, since, until)
+    indexes = indexes[(indexes >= start) & (indexes < end)]
+    if end > start and (not len(indexes) or indexes[-1] != end - 1):
+        indexes = np.append(indexes, end - 1)
+
+    if as_arrays:
+        return {
+            column: times[indexes] / 1000.0 if column == 'timestamp' else archive[column][indexes]
+            for column in columns
         }
-        for lat, lon, timestamp, accuracy in results
+    return _archive_rows(archive, indexes, columns)
+
+def _column_arrays(rows: List[Tuple], columns: Tuple[str, ...]) -> Dict[str, np.ndarray]:
+    """Turn numeric result rows into one NumPy array per column (None becomes NaN)."""
+    values = np.array(rows, dtype=float).reshape(len(rows), len(columns))
+    return {
+        column: values[:, i].astype(np.int64) if column == 'id' else values[:, i]
+        for i, column in enumerate(columns)
+    }
+
+def iter_location_history_pages(
+    session_token: str,
+    since=None,
+    until=None,
+    columns: Optional[Iterable[str]] = None,
+    page_size: int = HISTORY_PAGE_SIZE,
+    as_arrays: bool = False
+) -> Iterator:
+    """Stream a session's history in (timestamp, id) keyset pages.
+
+    Each page is a list of point dicts or, with as_arrays=True, a dict of
+    NumPy arrays per column (timestamps as float UNIX seconds, missing
+    accuracy as NaN). `since` and `until` are inclusive bounds; only one
+    page is held in memory at a time. Archived sessions are decoded once
+    and paged the same way.
+    """
+    columns = tuple(columns or HISTORY_COLUMNS)
+    unknown = set(columns) - set(HISTORY_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown history columns: {sorted(unknown)}")
+
+    selected = [
+        TIMESTAMP_SECONDS_SQL if as_arrays and column == 'timestamp' else column
+        for column in columns
     ]
+    sql = LOCATION_HISTORY_PAGE_SQL.format(
+        columns=''.join(f', {column}' for column in selected),
+        until=' AND timestamp <= ?' if until is not None else ''
+    )
 
-def end_tracking_session(session_token: str) -> bool:
-    """End an active tracking session."""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
+    conn = get_connection()
+    session_id = _history_session_id(conn, session_token)
+    if session_id is None:
+        return
+
+    archive = _load_archive(conn, session_id)
+    if archive is not None:
+        yield from _archive_pages(archive, columns, since, until, page_size, as_arrays)
+        return
+
+    # (since, 0) sorts before every id at that timestamp, so `since` is inclusive
+    last_timestamp = _format_timestamp(since) or ''
+    last_id = 0
+    until = _format_timestamp(until)
+
+    while True:
+        params = [session_id, last_timestamp, last_id]
+        if until is not None:
+            params.append(until)
+        params.append(page_size)
+        rows = conn.execute(sql, params).fetchall()
+        if not rows:
+            return
+
+        last_timestamp, last_id = rows[-1][0], rows[-1][1]
+        if as_arrays:
+            page = _column_arrays([row[2:] for row in rows], columns)
+        else:
+            page = [dict(zip(columns, row[2:])) for row in rows]
+        yield page
+
+        if len(rows) < page_size:
+            return
+
+def iter_location_history(session_token: str, since=None, until=None, **kwargs) -> Iterator[Dict]:
+    """Yield a session's points one by one, fetching them a page at a time."""
+    for page in iter_location_history_pages(session_token, since, until, **kwargs):
+        yield from page
+
+def rollup_level(resolution: float) -> Optional[int]:
+    """Return the coarsest rollup level no coarser than `resolution` meters, or None."""
+    level = None
+    for index, level_resolution in enumerate(ROLLUP_RESOLUTIONS):
+        if level_resolution <= resolution:
+            level = index
+    return level
+
+def _rollup_history(
+    conn: sqlite3.Connection,
+    session_id: int,
+    level: int,
+    columns: Tuple[str, ...],
+    since,
+    until,
+    as_arrays: bool
+) -> List[Tuple]:
+    """Read a rollup level as rows in `columns` order, ending at the newest point."""
+    names = {'id': 'point_id', 'timestamp': TIMESTAMP_SECONDS_SQL if as_arrays else 'timestamp'}
+    bounds, params = '', []
+    if since is not None:
+        bounds += ' AND timestamp >= ?'
+        params.append(_format_timestamp(since))
+    if until is not None:
+        bounds += ' AND timestamp <= ?'
+        params.append(_format_timestamp(until))
+
+    rows = conn.execute(f'''
+        SELECT point_id, {', '.join(names.get(column, column) for column in columns)}
+        FROM location_rollups
+        WHERE session_id = ? AND level = ?{bounds}
+        ORDER BY timestamp, point_id
+    ''', [session_id, level, *params]).fetchall()
+
+    # Rollups skip the tail of a track until it moves far enough; close the
+    # line with the newest point.
+    names['id'] = 'id'
+    last = conn.execute(f'''
+        SELECT id, {', '.join(names.get(column, column) for column in columns)}
+        FROM location_points
+        WHERE session_id = ?{bounds}
+        ORDER BY timestamp DESC, id DESC LIMIT 1
+    ''', [session_id, *params]).fetchone()
+    if last is not None and (not rows or rows[-1][0] != last[0]):
+        rows.append(last)
+    return [row[1:] for row in rows]
+
+def get_location_history(
+    session_token: str,
+    since=None,
+    until=None,
+    columns: Optional[Iterable[str]] = None,
+    as_arrays: bool = False,
+    resolution: Optional[float] = None
+):
+    """Get location history for a tracking session.
+
+    Returns a list of point dicts, or a dict of NumPy column arrays with
+    as_arrays=True. With `resolution` (meters, e.g. from
+    geometry_utils.tolerance_for_zoom) the points come from the coarsest
+    precomputed rollup that is still that fine; below the finest rollup the
+    full history is returned. Use iter_location_history_pages() to avoid
+    holding the whole history in memory.
+    """
+    columns = tuple(columns or ('latitude', 'longitude', 'timestamp', 'accuracy'))
+    level = rollup_level(resolution) if resolution is not None else None
+    if level is not None:
+        unknown = set(columns) - set(HISTORY_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown history columns: {sorted(unknown)}")
+        conn = get_connection()
+        session_id = _history_session_id(conn, session_token)
+        archive = _load_archive(conn, session_id) if session_id is not None else None
+        if archive is not None:
+            return _archive_rollup(archive, level, columns, since, until, as_arrays)
+        rows = _rollup_history(conn, session_id, level, columns, since, until, as_arrays) \
+            if session_id is not None else []
+        if as_arrays:
+            return _column_arrays(rows, columns)
+        return [dict(zip(columns, row)) for row in rows]
+
+    pages = iter_location_history_pages(
+        session_token, since, until, columns=columns, as_arrays=as_arrays
+    )
+    if not as_arrays:
+        return [point for page in pages for point in page]
+
+    pages = list(pages)
+    return {
+        column: np.concatenate([page[column] for page in pages])
+        if pages else np.empty(0, dtype=np.int64 if column == 'id' else float)
+        for column in columns
+    }
+
+def query_points_in_bbox(
+    min_lat: float,
+    min_lon: float,
+    max_lat: float,
+    max_lon: float,
+    session=None,
+    time_range: Optional[Tuple] = None,
+    limit: Optional[int] = None
+) -> List[Dict]:
+    """Get recorded points inside a bounding box, e.g. a map viewport.
+
+    Candidates come from the location_points_rtree index and are re-checked
+    against the exact coordinates (the R*Tree stores 32-bit floats).
+    Archived sessions are searched through their stored bounds. A min_lon
+    greater than max_lon selects a box crossing the antimeridian.
+    `session` is a session token or id; `time_range` is a (start, end) pair
+    where either end may be None. Points are returned in no particular order.
+    """
+    if min_lon > max_lon:
+        lon_ranges = [(min_lon, 180.0), (-180.0, max_lon)]
+    else:
+        lon_ranges = [(min_lon, max_lon)]
+
+    points = []
+    conn = get_connection()
+    for west, east in lon_ranges:
+        sql = '''
+            SELECT lp.id, lp.session_id, lp.latitude, lp.longitude, lp.timestamp, lp.accuracy
+            FROM location_points_rtree r
+            JOIN location_points lp ON lp.id = r.id
+            WHERE r.max_lat >= ? AND r.min_lat <= ? AND r.max_lon >= ? AND r.min_lon <= ?
+              AND lp.latitude BETWEEN ? AND ? AND lp.longitude BETWEEN ? AND ?
+        '''
+        params = [min_lat, max_lat, west, east, min_lat, max_lat, west, east]
+
+        if isinstance(session, str):
+            sql += ' AND lp.session_id = (SELECT id FROM tracking_sessions WHERE session_token = ?)'
+            params.append(session)
+        elif session is not None:
+            sql += ' AND lp.session_id = ?'
+            params.append(session)
+
+        if time_range:
+            start, end = time_range
+            if start is not None:
+                sql += ' AND lp.timestamp >= ?'
+                params.append(_format_timestamp(start))
+            if end is not None:
+                sql += ' AND lp.timestamp <= ?'
+                params.append(_format_timestamp(end))
+
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(limit - len(points))
+
+        points.extend(
+            {
+                'id': point_id,
+                'session_id': session_id,
+                'latitude': lat,
+                'longitude': lon,
+                'timestamp': timestamp,
+                'accuracy': accuracy
+            }
+            for point_id, session_id, lat, lon, timestamp, accuracy in conn.execute(sql, params)
+        )
+        if limit is not None and len(points) >= limit:
+            return points[:limit]
+
+    points.extend(_archived_points_in_bbox(
+        conn, min_lat, max_lat, lon_ranges, session, time_range,
+        None if limit is None else limit - len(points)
+    ))
+    return points
+
+def _archived_points_in_bbox(
+    conn: sqlite3.Connection,
+    min_lat: float,
+    max_lat: float,
+    lon_ranges: List[Tuple[float, float]],
+    session,
+    time_range: Optional[Tuple],
+    limit: Optional[int]
+) -> List[Dict]:
+    """Bounding-box search over archived sessions whose stored bounds overlap."""
+    if limit is not None and limit <= 0:
+        return []
+
+    sql = 'SELECT session_id, data FROM session_archives WHERE max_lat >= ? AND min_lat <= ?'
+    params = [min_lat, max_lat]
+    sql += ' AND (' + ' OR '.join('(max_lon >= ? AND min_lon <= ?)' for _ in lon_ranges) + ')'
+    for west, east in lon_ranges:
+        params += [west, east]
+
+    if isinstance(session, str):
+        sql += ' AND session_id = (SELECT id FROM tracking_sessions WHERE session_token = ?)'
+        params.append(session)
+    elif session is not None:
+        sql += ' AND session_id = ?'
+        params.append(session)
+
+    start, end = time_range or (None, None)
+    if start is not None:
+        sql += ' AND end_time >= ?'
+        params.append(_format_timestamp(start))
+    if end is not None:
+        sql += ' AND start_time <= ?'
+        params.append(_format_timestamp(end))
+
+    points = []
+    for session_id, data in conn.execute(sql, params).fetchall():
+        archive = decode_track(data)
+        lats, lons, times = archive['latitude'], archive['longitude'], archive['timestamp_ms']
+        mask = (lats >= min_lat) & (lats <= max_lat)
+        in_lon = np.zeros(len(lons), dtype=bool)
+        for west, east in lon_ranges:
+            in_lon |= (lons >= west) & (lons <= east)
+        mask &= in_lon
+        if start is not None:
+            mask &= times >= _timestamp_ms(start)
+        if end is not None:
+            mask &= times <= _timestamp_ms(end)
+
+        indexes = np.flatnonzero(mask)
+        if limit is not None:
+            indexes = indexes[:limit - len(points)]
+        for point in _archive_rows(archive, indexes, HISTORY_COLUMNS):
+            point['session_id'] = session_id
+            points.append(point)
+        if limit is not None and len(points) >= limit:
+            break
+
+    return points
+
+def end_tracking_session(session_token: str, archive: bool = False) -> bool:
+    """End an active tracking session, optionally compacting it with archive_session()."""
+    conn = get_connection()
     
-    c.execute('''
+    cursor = conn.execute('''
         UPDATE tracking_sessions
         SET is_active = FALSE, end_time = CURRENT_TIMESTAMP
         WHERE session_token = ? AND is_active = TRUE
     ''', (session_token,))
+    session_id = _session_ids.pop((DB_PATH, session_token), None)
+    _rollup_tails.pop((DB_PATH, session_id), None)
     
-    success = c.rowcount > 0
-    conn.commit()
-    conn.close()
-    return success
+    if cursor.rowcount > 0 and archive:
+        archive_session(session_token)
+    return cursor.rowcount > 0
+
+def archive_session(session_token: str) -> bool:
+    """Compact an ended session's points into one compressed archive blob.
+
+    The points are encoded with utils.archive_utils (microdegree coordinates,
+    millisecond timestamps) and their point and rollup rows are deleted in
+    the same transaction; history, rollup and bbox reads serve archived
+    sessions transparently. Freed pages are reused by SQLite; run VACUUM to shrink
+    the file itself. Returns False for active, unknown, empty or already
+    archived sessions.
+    """
+    with transaction() as conn:
+        row = conn.execute(
+            'SELECT id, is_active FROM tracking_sessions WHERE session_token = ?',
+            (session_token,)
+        ).fetchone()
+        if row is None or row[1]:
+            return False
+        session_id = row[0]
+
+        if conn.execute(
+            'SELECT 1 FROM session_archives WHERE session_id = ?', (session_id,)
+        ).fetchone():
+            return False
+
+        rows = conn.execute(ARCHIVE_POINTS_SQL, (session_id,)).fetchall()
+        if not rows:
+            return False
+
+        values = np.array(rows, dtype=float)
+        ids, times = values[:, 0].astype(np.int64), values[:, 3].astype(np.int64)
+        # Bounds must match the stored fixed-point coordinates
+        lats = np.round(values[:, 1] * COORDINATE_SCALE) / COORDINATE_SCALE
+        lons = np.round(values[:, 2] * COORDINATE_SCALE) / COORDINATE_SCALE
+        start_time, end_time = _format_timestamps_ms(times[[0, -1]])
+        conn.execute('''
+            INSERT INTO session_archives
+                (session_id, point_count, start_time, end_time,
+                 min_lat, max_lat, min_lon, max_lon, data)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            session_id, len(rows), start_time, end_time,
+            float(lats.min()), float(lats.max()), float(lons.min()), float(lons.max()),
+            encode_track(ids, lats, lons, times, values[:, 4])
+        ))
+        # Rollup levels are rebuilt from the archive when read
+        conn.execute('DELETE FROM location_rollups WHERE session_id = ?', (session_id,))
+        conn.execute('DELETE FROM location_points WHERE session_id = ?', (session_id,))
+
+    return True
 
 def create_group(group_name: str, created_by: int) -> int:
     """Create a new location sharing group."""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
+    conn = get_connection()
     
-    c.execute('''
+    cursor = conn.execute('''
         INSERT INTO groups (group_name, created_by)
         VALUES (?, ?)
     ''', (group_name, created_by))
     
-    group_id = c.lastrowid
-    conn.commit()
-    conn.close()
-    return group_id
+    return cursor.lastrowid
 
 def add_group_member(group_id: int, user_id: int, permissions: str = 'viewer') -> bool:
     """Add a user to a location sharing group."""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
+    conn = get_connection()
     
     try:
-        c.execute('''
+        conn.execute('''
             INSERT INTO group_members (group_id, user_id, permissions)
             VALUES (?, ?, ?)
         ''', (group_id, user_id, permissions))
-        
-        conn.commit()
-        success = True
+        with _group_snapshots_lock:
+            _group_snapshots.pop((DB_PATH, group_id), None)
+        return True
     except sqlite3.IntegrityError:
-        success = False
-    
-    conn.close()
-    return success
+        return False
 
 def get_group_members(group_id: int) -> List[Dict]:
     """Get all members of a location sharing group."""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
+    conn = get_connection()
     
-    c.execute('''
-        SELECT u.id, u.username, gm.permissions, gm.joined_at
-        FROM group_members gm
-        JOIN users u ON gm.user_id = u.id
-        WHERE gm.group_id = ?
-    ''', (group_id,))
-    
-    results = c.fetchall()
-    conn.close()
+    results = conn.execute(GROUP_MEMBERS_SQL, (group_id,)).fetchall()
     
     return [
         {
@@ -231,66 +1178,99 @@ def get_group_members(group_id: int) -> List[Dict]:
         for user_id, username, permissions, joined_at in results
     ]
 
+def get_group_snapshot(group_id: int) -> List[Dict]:
+    """Get every group member with their latest position in one indexed query.
+
+    Members with a recorded point get a 'location' dict. Results are cached
+    per process until a member joins or a member's new point is stored.
+    """
+    key = (DB_PATH, group_id)
+    with _group_snapshots_lock:
+        cached = _group_snapshots.get(key)
+    if cached is None or time.monotonic() - cached[0] > GROUP_SNAPSHOT_TTL:
+        conn = get_connection()
+        members = []
+        for user_id, username, permissions, joined_at, lat, lon, accuracy, timestamp in \
+                conn.execute(GROUP_SNAPSHOT_SQL, (group_id,)):
+            member = {
+                'id': user_id,
+                'username': username,
+                'permissions': permissions,
+                'joined_at': joined_at
+            }
+            if lat is not None:
+                member['location'] = {
+                    'latitude': lat,
+                    'longitude': lon,
+                    'accuracy': accuracy,
+                    'timestamp': timestamp
+                }
+            members.append(member)
+        cached = (time.monotonic(), {member['id'] for member in members}, members)
+        with _group_snapshots_lock:
+            _group_snapshots[key] = cached
+
+    # Copies, so callers (e.g. session state) cannot alter the cached snapshot
+    return [
+        {**member, 'location': dict(member['location'])} if 'location' in member else dict(member)
+        for member in cached[2]
+    ]
+
+def _invalidate_session_snapshots(session_id: int) -> None:
+    """Drop cached snapshots of the groups the session's user belongs to."""
+    if not _group_snapshots:
+        return
+    row = get_connection().execute(
+        'SELECT user_id FROM tracking_sessions WHERE id = ?', (session_id,)
+    ).fetchone()
+    if row is None:
+        return
+    with _group_snapshots_lock:
+        for key in [key for key, (_, user_ids, _) in _group_snapshots.items() if row[0] in user_ids]:
+            del _group_snapshots[key]
+
 def save_game_score(user_id: int, score: int, rounds_completed: int) -> int:
     """Save a game session score."""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
+    conn = get_connection()
     
-    c.execute('''
+    cursor = conn.execute('''
         INSERT INTO game_sessions (user_id, score, rounds_completed)
         VALUES (?, ?, ?)
     ''', (user_id, score, rounds_completed))
     
-    session_id = c.lastrowid
-    conn.commit()
-    conn.close()
-    return session_id
+    return cursor.lastrowid
 
 def get_leaderboard(limit=10):
+    """Get the top GeoGuesser scores from the in-memory leaderboard index."""
     try:
-        import sqlite3
-        import os
-        
-        # Create database directory if it doesn't exist
-        db_dir = "data"
-        if not os.path.exists(db_dir):
-            os.makedirs(db_dir)
-        
-        conn = sqlite3.connect(f"{db_dir}/geoguesser.db")
-        c = conn.cursor()
-        
-        # Create table if it doesn't exist
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS leaderboard (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT DEFAULT 'Anonymous',
-                score INTEGER,
-                rounds INTEGER,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Get leaderboard data
-        c.execute('''
-            SELECT username, score, rounds, timestamp 
-            FROM leaderboard 
-            ORDER BY score DESC 
-            LIMIT ?
-        ''', (limit,))
-        
-        results = c.fetchall()
-        conn.close()
-        
-        return [
-            {
-                'username': row[0],
-                'score': row[1],
-                'rounds': row[2],
-                'timestamp': row[3]
-            }
-            for row in results
-        ]
-        
+        entries = get_leaderboard_index().top(limit)
+        for rank, entry in enumerate(entries, start=1):
+            entry['rank'] = rank
+        return entries
+    except Exception as e:
+        print(f"Database error: {e}")
+        return []  # Return empty list on error
+
+def add_leaderboard_score(username: str, score: int, rounds: int) -> Optional[Dict]:
+    """Record a GeoGuesser score; returns the stored entry with its rank."""
+    try:
+        return get_leaderboard_index().add_score(username, score, rounds)
+    except Exception as e:
+        print(f"Database error: {e}")
+        return None
+
+def get_leaderboard_rank(entry_id: int) -> Optional[int]:
+    """Get the current rank of a GeoGuesser leaderboard entry."""
+    try:
+        return get_leaderboard_index().rank(entry_id)
+    except Exception as e:
+        print(f"Database error: {e}")
+        return None
+
+def get_leaderboard_around(entry_id: int, radius: int = 2) -> List[Dict]:
+    """Get a leaderboard entry with its `radius` neighbours on each side."""
+    try:
+        return get_leaderboard_index().around(entry_id, radius)
     except Exception as e:
         print(f"Database error: {e}")
-        return []  # Return empty list on error
\ No newline at end of file
+        return []
@@ -1,9 +1,14 @@
 import folium
 from folium import plugins
-from typing import List, Dict, Tuple, Optional
+from typing import List, Dict, Tuple, Optional, Union
+import numpy as np
 import branca.colormap as cm
 from streamlit_folium import folium_static
 import streamlit as st
+from utils.geometry_utils import simplify_for_zoom
+
+# Decimal places kept for coordinates written into map HTML (~1 m)
+COORDINATE_DECIMALS = 5
 
 def create_base_map(center_lat: float = 0, center_lon: float = 0, zoom_start: int = 2) -> folium.Map:
     """Create a base map with OpenStreetMap tiles."""
@@ -67,12 +72,14 @@ def add_heatmap(
 
 def add_polyline(
     m: folium.Map,
-    locations: List[Tuple[float, float]],
+    locations: Union[List[Tuple[float, float]], np.ndarray],
     color: str = "blue",
     weight: int = 2,
     opacity: float = 0.8
 ) -> folium.Map:
     """Add a polyline to the map."""
+    if isinstance(locations, np.ndarray):
+        locations = np.round(locations, COORDINATE_DECIMALS).tolist()
     folium.PolyLine(
         locations,
         color=color,
@@ -81,19 +88,46 @@ def add_polyline(
     ).add_to(m)
     return m
 
+def add_route(
+    m: folium.Map,
+    coordinates: np.ndarray,
+    zoom: Optional[int] = None,
+    color: str = "blue",
+    weight: int = 4,
+    opacity: float = 0.8,
+    pixels: float = 1.0
+) -> folium.Map:
+    """Add a route from an (n, 2) lat/lon array, simplified for the zoom level.
+
+    Vertices that would move the line by less than `pixels` on screen are
+    dropped; zoom defaults to the map's initial zoom.
+    """
+    if zoom is None:
+        zoom = m.options.get('zoom', 13)
+    simplified = simplify_for_zoom(coordinates, zoom, pixels)
+    return add_polyline(m, simplified, color, weight, opacity)
+
 def add_location_history(
     m: folium.Map,
     history: List[Dict],
     color: str = "blue",
     weight: int = 2,
-    opacity: float = 0.8
+    opacity: float = 0.8,
+    zoom: Optional[float] = None
 ) -> folium.Map:
-    """Add location history as a polyline with markers."""
+    """Add location history as a polyline with markers.
+
+    Long sessions should be loaded with get_location_history(...,
+    resolution=tolerance_for_zoom(zoom, lat)) so only a rollup is fetched;
+    with `zoom` the line is additionally simplified for that zoom level.
+    """
     if not history:
         return m
     
     # Create polyline
-    locations = [(point['latitude'], point['longitude']) for point in history]
+    locations = np.array([(point['latitude'], point['longitude']) for point in history])
+    if zoom is not None:
+        locations = simplify_for_zoom(locations, zoom)
     add_polyline(m, locations, color, weight, opacity)
     
     # Add markers for start and end points
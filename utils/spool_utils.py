@@ -0,0 +1,254 @@
+import atexit
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional
+
+# Local durable queue for writes to remote tables (override in .env)
+SPOOL_DB_PATH = os.getenv("SCORE_SPOOL_DB_PATH", "data/score_spool.db")
+SPOOL_BATCH_SIZE = 50
+SPOOL_FLUSH_INTERVAL = 2.0  # seconds between flushes when idle
+SPOOL_BACKOFF_BASE = 2.0  # seconds, doubled per failed attempt
+SPOOL_BACKOFF_MAX = 300.0
+
+
+class RejectedBatchError(Exception):
+    """Raised by send_batch when the remote table refused the rows.
+
+    Only then is a failing batch retried row by row; any other error is
+    treated as the remote being unreachable and the batch just waits.
+    """
+
+
+class Spool:
+    """Append-only SQLite queue of rows waiting to be sent to a remote table.
+
+    Rows are committed locally before enqueue() returns, then a background
+    flusher sends them in batches with `send_batch` and deletes them once
+    accepted. Failed rows are retried with exponential backoff and never
+    dropped. Every row carries an idempotency_key; a sender that upserts on
+    it keeps a batch that reached the server but was not acknowledged from
+    being stored twice when retried.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        send_batch: Callable[[List[Dict]], None],
+        db_path: str = None,
+        batch_size: int = SPOOL_BATCH_SIZE,
+        flush_interval: float = SPOOL_FLUSH_INTERVAL
+    ):
+        self.name = name
+        self.send_batch = send_batch
+        self.db_path = db_path or SPOOL_DB_PATH
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        # Held for a whole flush: _due does not claim rows, so two flushes
+        # at once would send the same batch
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # Called with the rows the remote table accepted
+        self.on_sent: Optional[Callable[[List[Dict]], None]] = None
+
+        self.sent = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        self.last_flush: Optional[float] = None
+
+    def _get_conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=FULL")  # a spooled row must survive power loss
+            conn.execute("PRAGMA busy_timeout=5000")
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS spool (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT NOT NULL,
+                    idempotency_key TEXT UNIQUE NOT NULL,
+                    payload TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    attempts INTEGER DEFAULT 0,
+                    next_attempt_at REAL DEFAULT 0,
+                    last_error TEXT
+                )
+            ''')
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_spool_due
+                ON spool (name, next_attempt_at, id)
+            ''')
+            self._conn = conn
+        return self._conn
+
+    def start(self) -> None:
+        """Start the background flusher (once)."""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopped.clear()
+                self._thread = threading.Thread(
+                    target=self._run, name=f"spool-{self.name}", daemon=True
+                )
+                self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop the flusher; spooled rows stay on disk for the next start."""
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def enqueue(self, row: Dict) -> Dict:
+        """Durably spool a row; returns it with its idempotency_key set."""
+        row = dict(row)
+        row.setdefault('idempotency_key', uuid.uuid4().hex)
+        with self._lock:
+            self._get_conn().execute('''
+                INSERT OR IGNORE INTO spool (name, idempotency_key, payload, created_at)
+                VALUES (?, ?, ?, ?)
+            ''', (self.name, row['idempotency_key'], json.dumps(row), time.time()))
+        self.start()
+        self._wake.set()
+        return row
+
+    def pending(self) -> List[Dict]:
+        """Return the rows not yet accepted by the remote table."""
+        with self._lock:
+            rows = self._get_conn().execute(
+                'SELECT payload FROM spool WHERE name = ? ORDER BY id', (self.name,)
+            ).fetchall()
+        return [json.loads(payload) for payload, in rows]
+
+    def _due(self, limit: int):
+        with self._lock:
+            return self._get_conn().execute('''
+                SELECT id, payload, attempts FROM spool
+                WHERE name = ? AND next_attempt_at <= ?
+                ORDER BY next_attempt_at, id LIMIT ?
+            ''', (self.name, time.time(), limit)).fetchall()
+
+    def _send(self, rows) -> Optional[bool]:
+        """Send rows; returns True if accepted, False if rejected, None if unreachable."""
+        payloads = [json.loads(payload) for _, payload, _ in rows]
+        try:
+            self.send_batch(payloads)
+        except Exception as e:
+            self.failures += 1
+            self.last_error = str(e)
+            return False if isinstance(e, RejectedBatchError) else None
+        with self._lock:
+            self._get_conn().executemany('DELETE FROM spool WHERE id = ?', [(row_id,) for row_id, _, _ in rows])
+        self.sent += len(rows)
+        if self.on_sent is not None:
+            self.on_sent(payloads)
+        return True
+
+    def _defer(self, rows) -> None:
+        now = time.time()
+        with self._lock:
+            self._get_conn().executemany('''
+                UPDATE spool SET attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?
+            ''', [
+                (
+                    attempts + 1,
+                    now + min(SPOOL_BACKOFF_BASE * 2 ** attempts, SPOOL_BACKOFF_MAX) * random.uniform(0.5, 1.5),
+                    self.last_error,
+                    row_id
+                )
+                for row_id, _, attempts in rows
+            ])
+
+    def flush(self) -> int:
+        """Send every due row now; returns the number of rows accepted.
+
+        Waits for a flush already running (e.g. the background flusher).
+        """
+        with self._flush_lock:
+            return self._flush()
+
+    def _flush(self) -> int:
+        sent = 0
+        while True:
+            rows = self._due(self.batch_size)
+            if not rows:
+                break
+            accepted = self._send(rows)
+            if accepted:
+                sent += len(rows)
+            elif accepted is None:
+                # Remote unreachable: back off the whole spool, not row by row
+                self._defer(rows)
+                break
+            elif len(rows) > 1:
+                # The server refused the batch: send rows one by one so a
+                # bad row does not hold back the rest
+                for row in rows:
+                    accepted = self._send([row])
+                    if accepted:
+                        sent += 1
+                    else:
+                        self._defer([row])
+                    if accepted is None:
+                        break
+                if accepted is None:
+                    break
+            else:
+                self._defer(rows)
+                continue
+            if len(rows) < self.batch_size:
+                break
+        self.last_flush = time.time()
+        return sent
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                self.flush()
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"Error flushing {self.name} spool: {e}")
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+
+    def status(self) -> Dict:
+        """Return spool depth and flusher state for dashboards."""
+        with self._lock:
+            depth, oldest, max_attempts = self._get_conn().execute('''
+                SELECT COUNT(*), MIN(created_at), MAX(attempts) FROM spool WHERE name = ?
+            ''', (self.name,)).fetchone()
+        return {
+            'depth': depth,
+            'oldest_age': time.time() - oldest if oldest else 0.0,
+            'max_attempts': max_attempts or 0,
+            'sent': self.sent,
+            'failures': self.failures,
+            'last_error': self.last_error,
+            'last_flush': self.last_flush
+        }
+
+
+_spools: Dict[str, Spool] = {}
+_spools_lock = threading.Lock()
+
+
+def get_spool(name: str, send_batch: Callable[[List[Dict]], None], db_path: str = None) -> Spool:
+    """Return the process-wide spool for a remote table, starting its flusher."""
+    with _spools_lock:
+        spool = _spools.get(name)
+        if spool is None:
+            spool = _spools[name] = Spool(name, send_batch, db_path)
+            atexit.register(spool.stop)
+    spool.start()
+    return spool
@@ -0,0 +1,183 @@
+import threading
+import time
+from bisect import bisect_right
+from typing import Callable, Dict, Iterable, List, Optional
+
+# Fixed score histogram bins (points per bin)
+SCORE_BIN_WIDTH = 50
+RECENT_GAMES = 20
+# Rebuild from the table this often to pick up games saved by other processes
+STATS_REFRESH_INTERVAL = 300  # seconds
+
+
+class GameStats:
+    """Running aggregates of Flag Guesser games.
+
+    Each recorded game updates per-difficulty sums, a fixed-bin score
+    histogram and a ring buffer of recent games, so reading the statistics
+    costs the same no matter how many games the table holds.
+    """
+
+    def __init__(self, bin_width: int = SCORE_BIN_WIDTH, recent: int = RECENT_GAMES):
+        self.bin_width = bin_width
+        self.recent_size = recent
+        self.by_difficulty: Dict[str, Dict] = {}
+        self.histogram: Dict[int, int] = {}
+        # Newest games, oldest first, with their sort keys alongside
+        self.recent: List[Dict] = []
+        self._recent_keys: List[str] = []
+        self._lock = threading.Lock()
+
+    def record(self, game: Dict) -> None:
+        """Add one game (a flag_leaderboard row) to the aggregates."""
+        score = game.get('score') or 0
+        accuracy = game.get('accuracy') or 0.0
+        time_taken = game.get('time_taken') or 0
+        with self._lock:
+            stats = self.by_difficulty.get(game.get('difficulty'))
+            if stats is None:
+                stats = self.by_difficulty[game.get('difficulty')] = {
+                    'games': 0,
+                    'score_sum': 0,
+                    'score_max': None,
+                    'accuracy_sum': 0.0,
+                    'time_sum': 0
+                }
+            stats['games'] += 1
+            stats['score_sum'] += score
+            stats['score_max'] = score if stats['score_max'] is None else max(stats['score_max'], score)
+            stats['accuracy_sum'] += accuracy
+            stats['time_sum'] += time_taken
+
+            bin_index = score // self.bin_width
+            self.histogram[bin_index] = self.histogram.get(bin_index, 0) + 1
+
+            # Rows may arrive out of date order (e.g. from the initial load)
+            key = str(game.get('game_date') or '')
+            if len(self.recent) < self.recent_size or key > self._recent_keys[0]:
+                position = bisect_right(self._recent_keys, key)
+                self._recent_keys.insert(position, key)
+                self.recent.insert(position, dict(game))
+                if len(self.recent) > self.recent_size:
+                    del self._recent_keys[0], self.recent[0]
+
+    def snapshot(self) -> Dict:
+        """Return totals, per-difficulty averages, the histogram and recent games."""
+        with self._lock:
+            games = sum(stats['games'] for stats in self.by_difficulty.values())
+            difficulties = {
+                difficulty: {
+                    'games': stats['games'],
+                    'avg_score': stats['score_sum'] / stats['games'],
+                    'max_score': stats['score_max'],
+                    'avg_accuracy': stats['accuracy_sum'] / stats['games'],
+                    'avg_time': stats['time_sum'] / stats['games']
+                }
+                for difficulty, stats in self.by_difficulty.items()
+            }
+            return {
+                'total_games': games,
+                'avg_score': sum(s['score_sum'] for s in self.by_difficulty.values()) / games if games else 0.0,
+                'max_score': max((s['score_max'] for s in self.by_difficulty.values()), default=None),
+                'avg_accuracy': sum(s['accuracy_sum'] for s in self.by_difficulty.values()) / games if games else 0.0,
+                'by_difficulty': difficulties,
+                'histogram': [
+                    {'start': index * self.bin_width, 'end': (index + 1) * self.bin_width, 'games': count}
+                    for index, count in sorted(self.histogram.items())
+                ],
+                'recent_games': list(reversed(self.recent))
+            }
+
+
+def _game_key(game: Dict):
+    """Identify a game across the table and the local write spool."""
+    return game.get('idempotency_key') or game.get('id')
+
+
+class StatsLayer:
+    """Process-wide GameStats, built once from the table and then kept up to date.
+
+    `loader` yields every stored game; it runs on first use and again in
+    the background every STATS_REFRESH_INTERVAL seconds, while reads keep
+    being served from the current aggregates.
+    """
+
+    def __init__(self, loader: Callable[[], Iterable[Dict]], refresh_interval: float = STATS_REFRESH_INTERVAL):
+        self.loader = loader
+        self.refresh_interval = refresh_interval
+        self._stats: Optional[GameStats] = None
+        self._built_at = 0.0
+        self._refreshing = False
+        self._pending: Optional[List[Dict]] = []
+        self._lock = threading.Lock()
+        # Serializes the first, synchronous build
+        self._initial_lock = threading.Lock()
+
+    def _build(self) -> GameStats:
+        with self._lock:
+            self._pending = []
+        stats = GameStats()
+        loaded_keys = set()
+        for game in self.loader():
+            key = _game_key(game)
+            if key is None or key not in loaded_keys:
+                stats.record(game)
+                loaded_keys.add(key)
+        with self._lock:
+            # Games saved while loading may be missing from what was read
+            for game in self._pending:
+                key = _game_key(game)
+                if key is None or key not in loaded_keys:
+                    stats.record(game)
+            self._pending = None
+        return stats
+
+    def _refresh(self) -> None:
+        try:
+            stats = self._build()
+            with self._lock:
+                self._stats, self._built_at = stats, time.monotonic()
+        except Exception as e:
+            print(f"Error refreshing game statistics: {e}")
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def get(self) -> Dict:
+        """Return the current statistics snapshot."""
+        if self._stats is None:
+            with self._initial_lock:
+                if self._stats is None:
+                    self._refresh()
+        else:
+            with self._lock:
+                # Checked and set together, so concurrent reruns start one refresh
+                start = not self._refreshing and time.monotonic() - self._built_at > self.refresh_interval
+                if start:
+                    self._refreshing = True
+            if start:
+                threading.Thread(target=self._refresh, daemon=True).start()
+        stats = self._stats
+        return stats.snapshot() if stats is not None else GameStats().snapshot()
+
+    def record(self, game: Dict) -> None:
+        """Add a newly saved game."""
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append(game)
+            stats = self._stats
+        if stats is not None:
+            stats.record(game)
+
+
+_layers: Dict[str, StatsLayer] = {}
+_layers_lock = threading.Lock()
+
+
+def get_stats_layer(name: str, loader: Callable[[], Iterable[Dict]]) -> StatsLayer:
+    """Return the process-wide stats layer registered under `name`."""
+    with _layers_lock:
+        layer = _layers.get(name)
+        if layer is None:
+            layer = _layers[name] = StatsLayer(loader)
+        return layer
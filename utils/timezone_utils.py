@@ -0,0 +1,236 @@
+import os
+import json
+import math
+import pickle
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+# timezone-boundary-builder GeoJSON release (combined.json or
+# combined-with-oceans.json), e.g. unzipped from
+# https://github.com/evansiroky/timezone-boundary-builder/releases
+TIMEZONE_BOUNDARIES_PATH = os.getenv("TIMEZONE_BOUNDARIES_PATH", "data/timezones.geojson")
+GRID_CELL_SIZE = 0.5  # degrees
+INDEX_VERSION = 1
+
+Ring = List[Tuple[float, float]]
+
+
+def _point_in_rings(lon: float, lat: float, rings: List[Ring]) -> bool:
+    """Even-odd ray casting over an outer ring and its holes."""
+    inside = False
+    for ring in rings:
+        j = len(ring) - 1
+        for i in range(len(ring)):
+            xi, yi = ring[i]
+            xj, yj = ring[j]
+            if (yi > lat) != (yj > lat) and lon < (xj - xi) * (lat - yi) / (yj - yi) + xi:
+                inside = not inside
+            j = i
+    return inside
+
+
+class TimezoneResolver:
+    """Point-to-timezone lookup over a grid index of timezone polygons.
+
+    Grid cells that lie entirely inside one zone resolve directly; only cells
+    crossed by a boundary fall back to point-in-polygon tests against the
+    polygons whose bounding boxes overlap the cell.
+    """
+
+    def __init__(self, path: str = None, cell_size: float = GRID_CELL_SIZE):
+        self.path = path or TIMEZONE_BOUNDARIES_PATH
+        self.cell_size = cell_size
+        self.zone_names: List[str] = []
+        self.polygons: List[Tuple[int, Tuple[float, float, float, float], List[Ring]]] = []
+        self.full_cells: Dict[Tuple[int, int], Optional[int]] = {}
+        self.boundary_cells: Dict[Tuple[int, int], List[int]] = {}
+        self.loaded = False
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return (math.floor(lat / self.cell_size), math.floor(lon / self.cell_size))
+
+    def _cell_range(self, min_lat, min_lon, max_lat, max_lon):
+        lat0, lon0 = self._cell(min_lat, min_lon)
+        lat1, lon1 = self._cell(max_lat, max_lon)
+        for i in range(lat0, lat1 + 1):
+            for j in range(lon0, lon1 + 1):
+                yield (i, j)
+
+    def load(self) -> bool:
+        """Load the prebuilt index, building it from the GeoJSON if needed."""
+        if self.loaded:
+            return True
+        if not os.path.exists(self.path):
+            return False
+
+        stat = os.stat(self.path)
+        signature = (INDEX_VERSION, self.cell_size, stat.st_size, int(stat.st_mtime))
+        index_path = f"{self.path}.index.pickle"
+
+        if os.path.exists(index_path):
+            try:
+                with open(index_path, 'rb') as f:
+                    data = pickle.load(f)
+                if data['signature'] == signature:
+                    self.zone_names = data['zone_names']
+                    self.polygons = data['polygons']
+                    self.full_cells = data['full_cells']
+                    self.boundary_cells = data['boundary_cells']
+                    self.loaded = True
+                    return True
+            except Exception as e:
+                print(f"Ignoring unreadable timezone index: {e}")
+
+        print(f"Building timezone index from {self.path}; run `python -m utils.timezone_utils` before deploying to skip this")
+        self._build()
+        try:
+            with open(index_path, 'wb') as f:
+                pickle.dump({
+                    'signature': signature,
+                    'zone_names': self.zone_names,
+                    'polygons': self.polygons,
+                    'full_cells': self.full_cells,
+                    'boundary_cells': self.boundary_cells
+                }, f, protocol=pickle.HIGHEST_PROTOCOL)
+        except OSError as e:
+            print(f"Could not write timezone index: {e}")
+
+        self.loaded = True
+        return True
+
+    def _build(self) -> None:
+        with open(self.path, encoding='utf-8') as f:
+            collection = json.load(f)
+
+        zone_ids: Dict[str, int] = {}
+        for feature in collection.get('features', []):
+            tzid = feature.get('properties', {}).get('tzid')
+            geometry = feature.get('geometry') or {}
+            if not tzid:
+                continue
+            if geometry.get('type') == 'Polygon':
+                parts = [geometry['coordinates']]
+            elif geometry.get('type') == 'MultiPolygon':
+                parts = geometry['coordinates']
+            else:
+                continue
+
+            zone = zone_ids.setdefault(tzid, len(zone_ids))
+            for part in parts:
+                rings = [[(float(x), float(y)) for x, y, *_ in ring] for ring in part]
+                lons = [x for x, _ in rings[0]]
+                lats = [y for _, y in rings[0]]
+                bbox = (min(lats), min(lons), max(lats), max(lons))
+                self.polygons.append((zone, bbox, rings))
+
+        self.zone_names = [None] * len(zone_ids)
+        for tzid, zone in zone_ids.items():
+            self.zone_names[zone] = tzid
+
+        candidates: Dict[Tuple[int, int], List[int]] = {}
+        edge_cells = set()
+        for index, (_, bbox, rings) in enumerate(self.polygons):
+            for cell in self._cell_range(*bbox):
+                candidates.setdefault(cell, []).append(index)
+            for ring in rings:
+                for (x1, y1), (x2, y2) in zip(ring, ring[1:] + ring[:1]):
+                    edge_cells.update(self._cell_range(
+                        min(y1, y2), min(x1, x2), max(y1, y2), max(x1, x2)
+                    ))
+
+        # Cells no edge passes through are wholly inside or outside each candidate
+        for cell, indexes in candidates.items():
+            if cell in edge_cells:
+                self.boundary_cells[cell] = indexes
+                continue
+            center_lat = (cell[0] + 0.5) * self.cell_size
+            center_lon = (cell[1] + 0.5) * self.cell_size
+            self.full_cells[cell] = None
+            for index in indexes:
+                zone, _, rings = self.polygons[index]
+                if _point_in_rings(center_lon, center_lat, rings):
+                    self.full_cells[cell] = zone
+                    break
+
+    def lookup(self, lat: float, lon: float) -> Optional[str]:
+        """Return the IANA zone name containing the point, or None."""
+        if not self.load():
+            return None
+
+        cell = self._cell(lat, lon)
+        if cell in self.full_cells:
+            zone = self.full_cells[cell]
+            return self.zone_names[zone] if zone is not None else None
+
+        for index in self.boundary_cells.get(cell, ()):
+            zone, (min_lat, min_lon, max_lat, max_lon), rings = self.polygons[index]
+            if min_lat <= lat <= max_lat and min_lon <= lon <= max_lon:
+                if _point_in_rings(lon, lat, rings):
+                    return self.zone_names[zone]
+        return None
+
+
+_resolver: Optional[TimezoneResolver] = None
+_resolver_lock = threading.Lock()
+
+
+def get_resolver() -> TimezoneResolver:
+    """Return the process-wide timezone resolver, loading it on first use."""
+    global _resolver
+    if _resolver is None:
+        with _resolver_lock:
+            if _resolver is None:
+                resolver = TimezoneResolver()
+                resolver.load()
+                _resolver = resolver
+    return _resolver
+
+
+def nautical_timezone(lon: float) -> str:
+    """Return the Etc/GMT zone for a longitude (sign is inverted in Etc names)."""
+    hours = max(-12, min(12, round(lon / 15)))
+    if hours == 0:
+        return "Etc/GMT"
+    return f"Etc/GMT{'-' if hours > 0 else '+'}{abs(hours)}"
+
+
+def timezone_details(zone_name: str, when: datetime = None) -> Optional[Dict]:
+    """Build the timezone info dict (name, UTC offset in seconds, DST flag)."""
+    try:
+        tz = ZoneInfo(zone_name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+
+    now = datetime.now(tz) if when is None else when.astimezone(tz)
+    dst = now.dst()
+    return {
+        'timezone': zone_name,
+        'offset': int(now.utcoffset().total_seconds()),
+        'dst': 1 if dst and dst.total_seconds() else 0
+    }
+
+
+def resolve_timezone(lat: float, lon: float) -> Optional[Dict]:
+    """Resolve timezone info offline from the boundary dataset, if available."""
+    zone_name = get_resolver().lookup(lat, lon)
+    if zone_name is None:
+        return None
+    return timezone_details(zone_name)
+
+
+if __name__ == '__main__':
+    # Deploy step: build the grid index next to the dataset so the first
+    # page request only unpickles it. python -m utils.timezone_utils [path]
+    import sys
+    import time
+
+    started = time.perf_counter()
+    resolver = TimezoneResolver(sys.argv[1] if len(sys.argv) > 1 else None)
+    if not resolver.load():
+        sys.exit(f"Timezone boundary dataset not found: {resolver.path}")
+    print(
+        f"Timezone index ready: {len(resolver.zone_names)} zones, {len(resolver.polygons)} polygons, "
+        f"{len(resolver.full_cells) + len(resolver.boundary_cells)} cells in {time.perf_counter() - started:.1f}s"
+    )